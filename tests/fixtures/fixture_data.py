@@ -1,11 +1,21 @@
 import tempfile
 
 import pytest
+from django.core.cache import cache
 from mixer.backend.django import mixer as _mixer
 from posts.models import Post, Group
 
 
-@pytest.fixture()
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Поколения кеша сдвигаются после коммита, а тесты его не делают:
+    # страницы, закешированные прошлым тестом, не должны отдаваться.
+    cache.clear()
+
+
+# Картинки и их миниатюры создаются сразу при сохранении поста: ни один
+# тест не должен писать в настоящий MEDIA_ROOT.
+@pytest.fixture(autouse=True)
 def mock_media(settings):
     with tempfile.TemporaryDirectory() as temp_directory:
         settings.MEDIA_ROOT = temp_directory
@@ -0,0 +1,324 @@
+"""Массовая загрузка постов, комментариев и подписок.
+
+Формат входа — тот, что пишет export_data: NDJSON или CSV с колонками
+api.export.EXPORTS, отсортированный по id. Строки вставляются
+bulk_create пачками по batch_size, транзакция фиксируется каждые
+chunk_size строк вместе с позицией в файле (ImportCheckpoint), поэтому
+повторный запуск после сбоя продолжает с первой незафиксированной
+строки.
+
+Посты и комментарии сохраняют id из файла, если он свободен, а иначе
+получают новый pk; соответствие пишется в ImportedId, и комментарии
+ищут свой пост только через него: к посту, которого не было в
+выгрузке, комментарий не прицепится. Уже загруженные строки, подписки,
+которые уже есть, и комментарии без поста пропускаются и считаются в
+отчёте load().
+
+Сигналы моделей при bulk_create не срабатывают. Индексы Meta.indexes и
+триггеры полнотекстового поиска снимаются на время загрузки, а в конце
+finish() строит их заново, пересчитывает счётчики, ссылки на картинки и
+ленты подписок и сдвигает общую эпоху поколений кеша: после массовой
+загрузки устаревает весь кеш на поколениях, и затронутые пространства
+имён не нужно помнить построчно.
+"""
+import csv
+import os
+import time
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.generations import bump_all
+from posts import search, timeline
+from posts.models import Comment, Follow, Group, Post, StoredImage, User
+from posts.utils import original_timestamps
+
+from .models import ImportCheckpoint, ImportedId
+from .serializers import loads
+
+MODELS = {'posts': Post, 'comments': Comment, 'follows': Follow}
+# Порядок загрузки: комментарии и подписки ссылаются на посты и авторов.
+ORDER = ('posts', 'comments', 'follows')
+# Счётчики отчёта load(): загружено, с новым id, уже загружены раньше,
+# подписка уже была, комментарий без поста.
+STATS = {
+    'loaded': 'загружено',
+    'remapped': 'с новым id',
+    'already_loaded': 'уже загружены',
+    'duplicates': 'уже были',
+    'orphans': 'без поста',
+}
+
+
+def read_rows(path: str, input_format: str):
+    """Словари строк файла, по одной в памяти."""
+    with open(path, newline='', encoding='utf-8') as source:
+        if input_format == 'csv':
+            yield from csv.DictReader(source)
+            return
+        for line in source:
+            if line.strip():
+                yield loads(line)
+
+
+def chunks(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_moment(value):
+    # CSV отдаёт пустую строку вместо null.
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Importer:
+    def __init__(self, batch_size: int = 2000, chunk_size: int = 50000,
+                 resume: bool = True, report=None):
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.resume = resume
+        self.report = report or (lambda message: None)
+        self.user_ids = {}
+        self.group_ids = {}
+        self.tables = set()
+        self.stats = Counter()
+        self.source = None
+        self.next_id = None
+        self.unusable_password = make_password(None)
+
+    def start(self, tables) -> None:
+        """Снимает индексы и триггеры с таблиц, которые будут загружены."""
+        self.tables.update(tables)
+        with connection.cursor() as cursor:
+            for table in tables:
+                for index in MODELS[table]._meta.indexes:
+                    cursor.execute(
+                        'DROP INDEX IF EXISTS '
+                        f'{connection.ops.quote_name(index.name)}')
+            if 'posts' in tables:
+                search.drop_triggers(cursor)
+
+    def load(self, table: str, path: str, input_format: str) -> Counter:
+        """Загружает файл в таблицу; возвращает счётчики STATS и read."""
+        model = MODELS[table]
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            path=os.path.abspath(path), defaults={'table': table})
+        if checkpoint.table != table:
+            raise ValueError(
+                f'{path} уже загружался как {checkpoint.table}')
+        done = checkpoint.last_id if self.resume else 0
+        rows = (row for row in read_rows(path, input_format)
+                if int(row['id']) > done)
+        self.stats = Counter()
+        self.source, self.next_id = (path, input_format), None
+        started = time.monotonic()
+        with original_timestamps(*MODELS.values()):
+            for chunk in chunks(rows, self.chunk_size):
+                with transaction.atomic():
+                    for batch in chunks(chunk, self.batch_size):
+                        objects = getattr(self, f'build_{table}')(batch)
+                        model.objects.bulk_create(objects)
+                        self.stats['loaded'] += len(objects)
+                    done = max(done, *(int(row['id']) for row in chunk))
+                    ImportCheckpoint.objects.filter(
+                        pk=checkpoint.pk,
+                    ).update(last_id=done, updated=timezone.now())
+                self.stats['read'] += len(chunk)
+                rate = self.stats['read'] / max(
+                    time.monotonic() - started, 1e-9)
+                self.report(
+                    f'{table}: {self.stats["read"]} строк, '
+                    f'{rate:.0f} строк/с')
+        return self.stats
+
+    def assign_ids(self, table: str, legacy_ids) -> dict:
+        """legacy id -> pk для строк, которых ещё нет в ImportedId.
+
+        Свободный id сохраняется. Занятый заменяется pk после
+        наибольшего id таблицы и файла, чтобы замена не заняла id
+        следующих строк файла. Соответствие записывается сразу.
+        """
+        model = MODELS[table]
+        legacy_ids = list(dict.fromkeys(legacy_ids))
+        loaded = set(ImportedId.objects.filter(
+            table=table, legacy_id__in=legacy_ids,
+        ).values_list('legacy_id', flat=True))
+        fresh = [pk for pk in legacy_ids if pk not in loaded]
+        taken = set(model.objects.filter(
+            pk__in=fresh).values_list('pk', flat=True))
+        if taken and self.next_id is None:
+            # Файл читается второй раз, только если id совпали.
+            last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+            self.next_id = 1 + max(last, *(
+                int(row['id']) for row in read_rows(*self.source)))
+        ids = {}
+        for pk in fresh:
+            if pk in taken:
+                ids[pk] = self.next_id
+                self.next_id += 1
+            else:
+                ids[pk] = pk
+        ImportedId.objects.bulk_create(
+            ImportedId(table=table, legacy_id=legacy_id, new_id=new_id)
+            for legacy_id, new_id in ids.items())
+        self.stats['already_loaded'] += len(loaded)
+        self.stats['remapped'] += len(taken)
+        return ids
+
+    def resolve(self, ids: dict, model, field: str, values, build):
+        """id объектов по username или slug; недостающие создаются."""
+        missing = {value for value in values if value} - set(ids)
+        if not missing:
+            return
+        found = model.objects.filter(**{f'{field}__in': missing})
+        ids.update(found.values_list(field, 'pk'))
+        missing -= set(ids)
+        if missing:
+            # SQLite не возвращает pk из bulk_create: перечитываем.
+            model.objects.bulk_create(build(value) for value in missing)
+            found = model.objects.filter(**{f'{field}__in': missing})
+            ids.update(found.values_list(field, 'pk'))
+
+    def users(self, *usernames) -> None:
+        self.resolve(
+            self.user_ids, User, 'username', usernames,
+            lambda username: User(
+                username=username, password=self.unusable_password),
+        )
+
+    def build_posts(self, rows) -> list:
+        self.users(*(row['author'] for row in rows))
+        self.resolve(
+            self.group_ids, Group, 'slug', [row.get('group') for row in rows],
+            lambda slug: Group(slug=slug, title=slug, description=''),
+        )
+        ids = self.assign_ids('posts', (int(row['id']) for row in rows))
+        posts = []
+        for row in rows:
+            pk = ids.pop(int(row['id']), None)
+            if pk is None:
+                continue
+            pub_date = parse_moment(row['pub_date'])
+            posts.append(Post(
+                pk=pk,
+                author_id=self.user_ids[row['author']],
+                group_id=self.group_ids.get(row.get('group')),
+                text=row['text'],
+                image=row.get('image') or '',
+                pub_date=pub_date,
+                updated_at=parse_moment(row.get('updated_at')) or pub_date,
+            ))
+        return posts
+
+    def build_comments(self, rows) -> list:
+        self.users(*(row['author'] for row in rows))
+        ids = self.assign_ids('comments', (int(row['id']) for row in rows))
+        posts = dict(ImportedId.objects.filter(
+            table='posts',
+            legacy_id__in={int(row['post_id']) for row in rows},
+        ).values_list('legacy_id', 'new_id'))
+        # Пост мог быть удалён после загрузки.
+        known = set(Post.objects.filter(
+            pk__in=set(posts.values())).values_list('pk', flat=True))
+        comments = []
+        for row in rows:
+            pk = ids.pop(int(row['id']), None)
+            if pk is None:
+                continue
+            post_id = posts.get(int(row['post_id']))
+            if post_id not in known:
+                self.stats['orphans'] += 1
+                continue
+            comments.append(Comment(
+                pk=pk,
+                post_id=post_id,
+                author_id=self.user_ids[row['author']],
+                text=row['text'],
+                created=parse_moment(row['created']),
+            ))
+        return comments
+
+    def build_follows(self, rows) -> list:
+        self.users(*(row['user'] for row in rows),
+                   *(row['author'] for row in rows))
+        pairs = {
+            (self.user_ids[row['user']], self.user_ids[row['author']]): row
+            for row in rows
+        }
+        existing = set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id'))
+        self.stats['duplicates'] += len(rows) - len(pairs) + len(
+            existing & set(pairs))
+        now = timezone.now()
+        follows = [
+            Follow(
+                user_id=user_id,
+                author_id=author_id,
+                created=parse_moment(row.get('created')) or now,
+            )
+            for (user_id, author_id), row in pairs.items()
+            if (user_id, author_id) not in existing
+        ]
+        return follows
+
+    def finish(self) -> None:
+        """Индексы, поиск, счётчики, картинки, ленты и кеш после загрузки."""
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for table in self.tables:
+                model = MODELS[table]
+                existing = connection.introspection.get_constraints(
+                    cursor, model._meta.db_table)
+                for index in model._meta.indexes:
+                    if index.name not in existing:
+                        cursor.execute(str(index.create_sql(model, editor)))
+            if 'posts' in self.tables:
+                search.rebuild_index(cursor)
+                search.install_triggers(cursor)
+        self.report('Индексы построены')
+        if 'posts' in self.tables:
+            names = (
+                Post.objects.exclude(image='').order_by()
+                .values_list('image', flat=True).distinct().iterator()
+            )
+            for batch in chunks(names, self.batch_size):
+                StoredImage.objects.bulk_create(
+                    (StoredImage(name=name) for name in batch),
+                    ignore_conflicts=True,
+                )
+        call_command('recount', stdout=_Report(self.report))
+        if self.tables & {'posts', 'follows'}:
+            cache.delete(timeline.PULLED_AUTHORS_KEY)
+            call_command('rebuild_timelines', stdout=_Report(self.report))
+        bump_all()
+
+
+class _Report:
+    # stdout для call_command, пишущий в отчёт импорта.
+    def __init__(self, report):
+        self.report = report
+
+    def write(self, message: str) -> None:
+        if message.strip():
+            self.report(message.strip())
+
+    def flush(self) -> None:
+        pass
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core import serializers
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from api.serializers import (POST_FIELDS, dumps, select_fields,
+                             serialize_posts)
+from core.benchmarks import measure, scratch_database
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Меряет выдачу страницы постов в JSON API: сериализацию и '
+        'запрос целиком (во временной БД)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--limit', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        limit = min(options['limit'], settings.API_MAX_LIMIT)
+        with scratch_database(), \
+                override_settings(ALLOWED_HOSTS=['testserver']):
+            reader = self.fill(options['posts'])
+            client = Client()
+            client.force_login(reader)
+            url = reverse('api:index')
+            posts = Post.objects.all()
+            cases = (
+                ('django serializers', lambda: serializers.serialize(
+                    'json', posts.select_related('author', 'group')[:limit])),
+                ('serialize_posts', lambda: dumps(serialize_posts(
+                    select_fields(posts, POST_FIELDS)[:limit]))),
+                ('fields=id,text', lambda: dumps(serialize_posts(
+                    select_fields(posts, ('id', 'text'))[:limit],
+                    ('id', 'text')))),
+                ('GET /api/v1/posts/', lambda: client.get(
+                    url, {'limit': limit})),
+            )
+            self.stdout.write(
+                f'{limit} постов на ответ, '
+                f'{len(client.get(url, {"limit": limit}).content)} байт')
+            self.stdout.write(f'{"case":>20} {"p50":>10} {"p95":>10}')
+            for name, func in cases:
+                timings = measure(func, options['repeat'])
+                self.stdout.write(
+                    f'{name:>20} {timings["p50"]:>8.1f}ms '
+                    f'{timings["p95"]:>8.1f}ms'
+                )
+
+    def fill(self, total: int):
+        User.objects.bulk_create(
+            User(username=f'bench_api_{i}', first_name='Автор', last_name=i)
+            for i in range(100))
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'group-{i}', description='')
+            for i in range(10))
+        # SQLite не возвращает pk из bulk_create.
+        authors = list(User.objects.all())
+        groups = list(Group.objects.all())
+        Post.objects.bulk_create(
+            (Post(author=authors[i % len(authors)],
+                  group=groups[i % len(groups)] if i % 3 else None,
+                  text=f'Пост номер {i} ' * 10)
+             for i in range(total))
+        )
+        return User.objects.create_user(username='bench_api_reader')
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты, комментарии или подписки '
+        'в NDJSON или CSV'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(export.EXPORTS))
+        parser.add_argument(
+            '--format', dest='export_format', default='ndjson',
+            choices=sorted(export.FORMATS))
+        parser.add_argument(
+            '--since', help='Только строки, изменённые с этого момента '
+                            '(ISO-дата или дата-время)')
+        parser.add_argument(
+            '--output', help='Файл для выгрузки (по умолчанию stdout)')
+
+    def handle(self, *args, **options):
+        since = options['since']
+        try:
+            since = export.parse_since(since) if since else None
+        except ValueError as error:
+            raise CommandError(error)
+        chunks = export.stream(
+            options['table'], options['export_format'], since)
+        if options['output'] is None:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        with open(options['output'], 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
@@ -0,0 +1,68 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import export
+from api.importer import ORDER, STATS, Importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Массово загружает посты, комментарии и подписки из выгрузки '
+        'export_data (NDJSON или CSV)'
+    )
+
+    def add_arguments(self, parser):
+        for table in ORDER:
+            parser.add_argument(
+                f'--{table}', metavar='PATH', help=f'Файл с {table}')
+        parser.add_argument(
+            '--format', dest='input_format', choices=sorted(export.FORMATS),
+            help='Формат файлов (по умолчанию — по расширению)')
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Строк в одном INSERT')
+        parser.add_argument(
+            '--chunk-size', type=int, default=50000,
+            help='Строк в одной транзакции')
+        parser.add_argument(
+            '--no-resume', dest='resume', action='store_false',
+            help='Читать файлы с начала, а не с сохранённой позиции; '
+                 'уже загруженные строки всё равно пропускаются')
+
+    def handle(self, *args, **options):
+        files = {
+            table: options[table] for table in ORDER if options[table]}
+        if not files:
+            raise CommandError('Укажите хотя бы один файл: '
+                               + ', '.join(f'--{table}' for table in ORDER))
+        for path in files.values():
+            if not os.path.isfile(path):
+                raise CommandError(f'Файл не найден: {path}')
+        importer = Importer(
+            batch_size=options['batch_size'],
+            chunk_size=options['chunk_size'],
+            resume=options['resume'],
+            report=self.stdout.write,
+        )
+        started = time.monotonic()
+        importer.start(files)
+        total = loaded = 0
+        for table, path in files.items():
+            input_format = options['input_format'] or (
+                'csv' if path.lower().endswith('.csv') else 'ndjson')
+            stats = importer.load(table, path, input_format)
+            counts = ', '.join(
+                f'{label} {stats[name]}'
+                for name, label in STATS.items() if stats[name])
+            self.stdout.write(
+                f'{table}: прочитано {stats["read"]}'
+                + (f', {counts}' if counts else ''))
+            total += stats['read']
+            loaded += stats['loaded']
+        importer.finish()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {loaded} из {total} строк за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с)'))
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=1024, unique=True)),
+                ('table', models.CharField(max_length=16)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImportedId',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=16)),
+                ('legacy_id', models.BigIntegerField()),
+                ('new_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='importedid',
+            constraint=models.UniqueConstraint(fields=('table', 'legacy_id'), name='unique_imported_id'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import models
+
+
+class ImportCheckpoint(models.Model):
+    """Докуда import_yatube дочитал файл выгрузки."""
+    path = models.CharField(max_length=1024, unique=True)
+    table = models.CharField(max_length=16)
+    last_id = models.BigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.path}: {self.table} до id {self.last_id}'
+
+
+class ImportedId(models.Model):
+    """pk, под которым загружена строка выгрузки с id legacy_id.
+
+    По нему комментарии находят свои посты, если id поста из выгрузки
+    был занят и пост получил другой pk.
+    """
+    table = models.CharField(max_length=16)
+    legacy_id = models.BigIntegerField()
+    new_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['table', 'legacy_id'], name='unique_imported_id')
+        ]
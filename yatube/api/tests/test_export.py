@@ -0,0 +1,83 @@
+import csv
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='analyst', is_staff=True)
+        cls.user = User.objects.create_user(username='writer')
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'Пост {i}')
+            for i in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.staff, text='Первый, "с кавычками"')
+        Follow.objects.create(user=cls.staff, author=cls.user)
+
+    def setUp(self):
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def lines(self, response):
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_export_is_staff_only(self):
+        """ Выгрузка доступна только сотрудникам """
+        url = reverse('api:export', args=('posts',))
+        self.assertEqual(self.client.get(url).status_code, 401)
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(client.get(url).status_code, 403)
+
+    def test_posts_ndjson_streams_every_row(self):
+        """ NDJSON отдаётся потоком, по строке на пост, через все чанки """
+        response = self.staff_client.get(
+            reverse('api:export', args=('posts',)))
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in self.lines(response)]
+        self.assertEqual(
+            [row['id'] for row in rows], [post.pk for post in self.posts])
+        self.assertEqual(rows[0]['author'], 'writer')
+
+    def test_comments_csv(self):
+        """ CSV начинается с заголовка и экранирует значения """
+        response = self.staff_client.get(
+            reverse('api:export', args=('comments',)), {'format': 'csv'})
+        header, row = csv.reader(self.lines(response))
+        self.assertEqual(header[:3], ['id', 'post_id', 'author'])
+        self.assertEqual(row[3], 'Первый, "с кавычками"')
+
+    def test_since_returns_only_changes(self):
+        """ since оставляет только изменённые с этого момента строки """
+        Post.objects.exclude(pk=self.posts[-1].pk).update(
+            updated_at=timezone.now() - timedelta(days=2))
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        response = self.staff_client.get(
+            reverse('api:export', args=('posts',)), {'since': since})
+        rows = [json.loads(line) for line in self.lines(response)]
+        self.assertEqual([row['id'] for row in rows], [self.posts[-1].pk])
+        response = self.staff_client.get(
+            reverse('api:export', args=('posts',)), {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command_writes_follows(self):
+        """ Команда export_data выгружает подписки """
+        out = StringIO()
+        call_command('export_data', 'follows', stdout=out)
+        row = json.loads(out.getvalue())
+        self.assertEqual((row['user'], row['author']), ('analyst', 'writer'))
@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import ImportedId
+from core.generations import get_generations
+from posts.models import Comment, Follow, Group, Post
+from posts.search import SearchResults
+
+User = get_user_model()
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        author = User.objects.create_user(username='writer')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        self.pub_date = timezone.now() - timedelta(days=30)
+        self.posts = []
+        for i in range(5):
+            post = Post.objects.create(
+                author=author, group=group, text=f'Импортный пост {i}')
+            Post.objects.filter(pk=post.pk).update(pub_date=self.pub_date)
+            self.posts.append(post)
+        Comment.objects.create(
+            post=self.posts[0], author=reader, text='Комментарий')
+        Follow.objects.create(user=reader, author=author)
+        self.files = {
+            'posts': self.dump('posts', 'ndjson'),
+            'comments': self.dump('comments', 'csv'),
+            'follows': self.dump('follows', 'ndjson'),
+        }
+        Follow.objects.all().delete()
+        Comment.objects.all().delete()
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+    def dump(self, table: str, export_format: str) -> str:
+        path = os.path.join(self.directory, f'{table}.{export_format}')
+        call_command('export_data', table, format=export_format, output=path)
+        return path
+
+    def load(self, *tables, **options) -> str:
+        output = StringIO()
+        call_command(
+            'import_yatube', stdout=output, batch_size=2,
+            chunk_size=3,
+            **{table: self.files[table] for table in tables}, **options)
+        return output.getvalue()
+
+    def test_round_trip_keeps_ids_dates_and_counters(self):
+        """ Импорт выгрузки сохраняет id, pub_date и пересчитывает счётчики """
+        self.load('posts', 'comments', 'follows')
+        posts = Post.objects.order_by('pk')
+        self.assertEqual(
+            [post.pk for post in posts], [post.pk for post in self.posts])
+        for post in posts:
+            self.assertEqual(post.pub_date, self.pub_date)
+            self.assertEqual(post.author.username, 'writer')
+            self.assertEqual(post.group.slug, 'group')
+        self.assertEqual(posts[0].comments_count, 1)
+        self.assertTrue(Follow.objects.filter(
+            user__username='reader', author__username='writer').exists())
+
+    def test_import_retires_all_generations(self):
+        """ После импорта устаревают поколения всех пространств имён """
+        namespaces = ['posts', 'author:1', 'follow:1', 'post:1']
+        before = get_generations(namespaces)
+        self.load('posts', 'comments', 'follows')
+        after = get_generations(namespaces)
+        for namespace in namespaces:
+            self.assertNotEqual(after[namespace], before[namespace])
+
+    def test_indexes_and_search_restored(self):
+        """ После импорта индексы и полнотекстовый поиск на месте """
+        self.load('posts')
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table)
+        for index in Post._meta.indexes:
+            self.assertIn(index.name, constraints)
+        self.assertEqual(SearchResults('импортный').count(), 5)
+        Post.objects.create(
+            author=User.objects.get(username='writer'), text='Импортный ещё')
+        self.assertEqual(SearchResults('импортный').count(), 6)
+
+    def test_resume_skips_loaded_rows(self):
+        """ Повторный запуск продолжает файл с сохранённой позиции и не
+        дублирует и не меняет загруженные строки """
+        self.load('posts')
+        Post.objects.filter(pk=self.posts[0].pk).update(text='Изменён')
+        Post.objects.filter(pk=self.posts[-1].pk).delete()
+        output = self.load('posts')
+        self.assertIn('posts: прочитано 0', output)
+        self.assertEqual(Post.objects.count(), 4)
+        output = self.load('posts', resume=False)
+        self.assertIn('posts: прочитано 5, уже загружены 5', output)
+        self.assertEqual(Post.objects.count(), 4)
+        self.assertEqual(
+            Post.objects.get(pk=self.posts[0].pk).text, 'Изменён')
+
+    def test_taken_ids_are_remapped(self):
+        """ Пост с занятым id получает новый pk, комментарий идёт за ним,
+        а комментарий к посту не из выгрузки пропускается с отчётом """
+        legacy = self.posts[0].pk
+        native = Post.objects.create(
+            pk=legacy, text='Свой пост',
+            author=User.objects.create_user(username='native'))
+        output = self.load('posts', 'comments')
+        self.assertIn('posts: прочитано 5, загружено 5, с новым id 1',
+                      output)
+        self.assertIn('Загружено 6 из 6 строк', output)
+        self.assertEqual(Post.objects.count(), 6)
+        native.refresh_from_db()
+        self.assertEqual(native.text, 'Свой пост')
+        self.assertEqual(native.comments_count, 0)
+        moved = Post.objects.get(text='Импортный пост 0')
+        self.assertNotEqual(moved.pk, legacy)
+        self.assertEqual(moved.comments.get().text, 'Комментарий')
+
+        Post.objects.filter(pk=moved.pk).delete()
+        output = self.load('comments', resume=False)
+        self.assertIn('comments: прочитано 1, уже загружены 1', output)
+        Comment.objects.all().delete()
+        ImportedId.objects.filter(table='comments').delete()
+        output = self.load('comments', resume=False)
+        self.assertIn('comments: прочитано 1, без поста 1', output)
+        self.assertFalse(Comment.objects.exists())
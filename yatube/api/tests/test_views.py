@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Проза', slug='prose', description='Романы')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, text=f'Глава {i}', group=cls.group)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_index_embeds_author_and_group(self):
+        """ Лента отдаёт посты с автором и группой внутри """
+        response = self.client.get(reverse('api:index'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        first = response.json()['results'][0]
+        self.assertEqual(first['id'], self.posts[-1].pk)
+        self.assertEqual(first['author'], {
+            'username': 'writer', 'full_name': 'Лев Толстой'})
+        self.assertEqual(first['group'], {'slug': 'prose', 'title': 'Проза'})
+
+    def test_cursor_pagination(self):
+        """ next ведёт на следующую страницу, пока посты не кончатся """
+        url = reverse('api:profile', args=(self.user.username,))
+        url = f'{url}?limit=2'
+        ids = []
+        while url and len(ids) <= len(self.posts):
+            data = self.client.get(url).json()
+            ids.extend(post['id'] for post in data['results'])
+            url = data['next']
+        self.assertEqual(ids, [post.pk for post in reversed(self.posts)])
+
+    def test_sparse_fields(self):
+        """ ?fields= оставляет только запрошенные поля """
+        response = self.client.get(
+            reverse('api:group_list', args=(self.group.slug,)),
+            {'fields': 'id,text'})
+        for post in response.json()['results']:
+            self.assertEqual(set(post), {'id', 'text'})
+        response = self.client.get(reverse('api:index'), {'fields': 'likes'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_embedded_objects_in_constant_queries(self):
+        """ Число запросов не зависит от размера страницы """
+        url = reverse('api:index')
+        counts = []
+        for limit in (1, 3):
+            with CaptureQueriesContext(connection) as queries:
+                self.authorized_client.get(url, {'limit': limit})
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_cache_headers(self):
+        """ Ответ несёт ETag и Cache-Control, повтор получает 304 """
+        url = reverse('api:post_detail', args=(self.posts[0].pk,))
+        response = self.client.get(url)
+        self.assertIn(
+            f'max-age={settings.API_CACHE_MAX_AGE}',
+            response['Cache-Control'])
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_errors_are_json(self):
+        """ 404 и 401 отдаются в JSON """
+        response = self.client.get(reverse('api:post_detail', args=(0,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('detail', response.json())
+        response = self.client.get(reverse('api:follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_follow_feed(self):
+        """ Лента подписок отдаёт посты авторов, на которых подписан """
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.authorized_client.get(reverse('api:follow_index'))
+        self.assertEqual(
+            [post['id'] for post in response.json()['results']],
+            [post.pk for post in reversed(self.posts)])
@@ -0,0 +1,205 @@
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import condition, require_safe
+
+from core.pagecache import add_cache_tags, cache_anonymous_page
+from posts.etags import (follow_etag, group_etag, index_etag, post_etag,
+                         profile_etag)
+from posts.models import Group, Post, User
+from posts.paginators import CursorPaginator
+from posts.timeline import feed_page
+from posts.utils import post_cache_tags
+
+from . import export
+from .serializers import (author_data, dumps, group_data, parse_fields,
+                          select_fields, serialize_posts)
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def json_response(data, status: int = 200) -> HttpResponse:
+    return HttpResponse(
+        dumps(data), status=status, content_type='application/json')
+
+
+def api_view(view):
+    """Ответы и ошибки в JSON, заголовки кеширования для клиентов.
+
+    Публичные ответы можно держать в кеше API_CACHE_MAX_AGE секунд,
+    дальше клиент переспрашивает с If-None-Match и получает 304.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            response = view(request, *args, **kwargs)
+        except Http404:
+            response = json_response({'detail': 'Не найдено'}, 404)
+        except ApiError as error:
+            response = json_response({'detail': error.detail}, error.status)
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, max_age=0)
+        else:
+            patch_cache_control(
+                response, public=True, max_age=settings.API_CACHE_MAX_AGE)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+    return require_safe(wrapper)
+
+
+def requested_fields(request) -> tuple:
+    try:
+        return parse_fields(request.GET.get('fields'))
+    except ValueError as error:
+        raise ApiError(400, str(error))
+
+
+def page_size(request) -> int:
+    value = request.GET.get('limit')
+    if value is None:
+        return settings.POST_QUANTITY
+    if not value.isdigit() or not 1 <= int(value) <= settings.API_MAX_LIMIT:
+        raise ApiError(
+            400, f'limit должен быть от 1 до {settings.API_MAX_LIMIT}')
+    return int(value)
+
+
+def page_url(request, cursor: str):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'?{query.urlencode()}')
+
+
+def posts_page(request, posts, fields: tuple) -> dict:
+    """Страница постов по курсору: results, next и previous."""
+    paginator = CursorPaginator(
+        select_fields(posts, fields), page_size(request),
+        request.GET.get('cursor'))
+    page = paginator.page()
+    add_cache_tags(request, *post_cache_tags(page))
+    return {
+        'results': serialize_posts(page, fields),
+        'next': page_url(request, paginator.next_cursor),
+        'previous': page_url(request, paginator.previous_cursor),
+    }
+
+
+@api_view
+@cache_anonymous_page
+@condition(etag_func=index_etag)
+def index(request):
+    add_cache_tags(request, 'posts')
+    fields = requested_fields(request)
+    return json_response(posts_page(request, Post.objects.all(), fields))
+
+
+@api_view
+@cache_anonymous_page
+@condition(etag_func=group_etag)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    add_cache_tags(request, f'group:{group.pk}')
+    fields = requested_fields(request)
+    data = {
+        'group': {**group_data(group), 'description': group.description,
+                  'posts_count': group.posts_count},
+        **posts_page(request, group.posts.all(), fields),
+    }
+    return json_response(data)
+
+
+@api_view
+@cache_anonymous_page
+@condition(etag_func=profile_etag)
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    add_cache_tags(
+        request, f'author:{author.pk}', f'author_posts:{author.pk}')
+    fields = requested_fields(request)
+    stats = getattr(author, 'stats', None)
+    data = {
+        'author': {
+            **author_data(author),
+            'posts_count': stats.posts_count if stats else 0,
+            'followers_count': stats.followers_count if stats else 0,
+            'following_count': stats.following_count if stats else 0,
+        },
+        **posts_page(request, author.posts.all(), fields),
+    }
+    return json_response(data)
+
+
+@api_view
+@cache_anonymous_page
+@condition(etag_func=post_etag)
+def post_detail(request, post_id):
+    fields = requested_fields(request)
+    post = get_object_or_404(Post.objects.only('author_id', 'group_id'),
+                             pk=post_id)
+    add_cache_tags(request, *post_cache_tags([post]))
+    rows = select_fields(Post.objects.filter(pk=post_id), fields)
+    return json_response(serialize_posts(rows, fields)[0])
+
+
+@api_view
+def follow_index(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужна авторизация')
+    return follow_page(request)
+
+
+@condition(etag_func=follow_etag)
+def follow_page(request):
+    fields = requested_fields(request)
+    page = feed_page(
+        request.user, None, request.GET.get('cursor'), page_size(request))
+    paginator = page.paginator
+    # Лента отдаёт модели; строки для вывода — одним запросом по pk.
+    ids = [post.pk for post in page]
+    rows = {row.pk: row for row in select_fields(
+        Post.objects.filter(pk__in=ids), fields)}
+    return json_response({
+        'results': serialize_posts([rows[pk] for pk in ids], fields),
+        'next': page_url(request, paginator.next_cursor),
+        'previous': page_url(request, paginator.previous_cursor),
+    })
+
+
+@require_safe
+@never_cache
+def export_table(request, table):
+    """Потоковая выгрузка таблицы для сотрудников: ?format=&since=."""
+    if not request.user.is_authenticated:
+        return json_response({'detail': 'Нужна авторизация'}, 401)
+    if not request.user.is_staff:
+        return json_response({'detail': 'Только для сотрудников'}, 403)
+    if table not in export.EXPORTS:
+        return json_response({'detail': 'Не найдено'}, 404)
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in export.FORMATS:
+        return json_response(
+            {'detail': f'format: {", ".join(export.FORMATS)}'}, 400)
+    since = request.GET.get('since')
+    try:
+        since = export.parse_since(since) if since else None
+    except ValueError as error:
+        return json_response({'detail': str(error)}, 400)
+    response = StreamingHttpResponse(
+        export.stream(table, export_format, since),
+        content_type=export.FORMATS[export_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{table}.{export_format}"')
+    return response
@@ -0,0 +1,35 @@
+import time
+from contextlib import contextmanager
+
+from django.test.utils import setup_databases, teardown_databases
+
+
+@contextmanager
+def scratch_database(verbosity: int = 0):
+    """Тестовая БД на время бенчмарка, рабочие данные не трогаются."""
+    old_config = setup_databases(verbosity, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity)
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def measure(func, repeat: int) -> dict:
+    """Запускает func repeat раз и возвращает задержки в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'p50': percentile(timings, 50),
+        'p95': percentile(timings, 95),
+        'p99': percentile(timings, 99),
+        'mean': sum(timings) / len(timings),
+    }
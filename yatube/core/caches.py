@@ -0,0 +1,13 @@
+"""Бэкенды кеша со счётчиками попаданий для Server-Timing."""
+from django.core.cache.backends import locmem
+
+from . import sqlite_cache
+from .instrumentation import CacheMetricsMixin
+
+
+class LocMemCache(CacheMetricsMixin, locmem.LocMemCache):
+    pass
+
+
+class SQLiteCache(CacheMetricsMixin, sqlite_cache.SQLiteCache):
+    pass
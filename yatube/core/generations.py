@@ -0,0 +1,74 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+KEY_PREFIX = 'generation'
+# Общая эпоха: входит в поколение каждого пространства имён.
+EPOCH = '*'
+
+
+def _key(namespace: str) -> str:
+    return f'{KEY_PREFIX}:{namespace}'
+
+
+def _counters(namespaces) -> dict:
+    """Счётчики пространств имён за один get_many.
+
+    Пропавший из кеша счётчик стартует с текущего времени в наносекундах,
+    чтобы не совпасть ни с одним из уже выданных поколений.
+    """
+    keys = {_key(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(keys)
+    counters = {keys[key]: value for key, value in found.items()}
+    for namespace in set(keys.values()) - set(counters):
+        key = _key(namespace)
+        cache.add(key, time.time_ns(), None)
+        counters[namespace] = cache.get(key)
+    return counters
+
+
+def get_generations(namespaces) -> dict:
+    """Поколения нескольких пространств имён за один get_many.
+
+    Поколение — счётчик пространства вместе с общей эпохой, поэтому
+    bump_all устаревает ключи всех пространств разом.
+    """
+    counters = _counters({*namespaces, EPOCH})
+    epoch = counters.pop(EPOCH)
+    return {
+        namespace: f'{epoch}.{counter}'
+        for namespace, counter in counters.items()
+    }
+
+
+def get_generation(namespace: str) -> str:
+    """Текущее поколение пространства имён для версии ключей кеша."""
+    return get_generations([namespace])[namespace]
+
+
+def bump_generation(*namespaces: str) -> None:
+    """Сдвигает поколения: все ключи на старом поколении устаревают."""
+    for namespace in namespaces:
+        try:
+            cache.incr(_key(namespace))
+        except ValueError:
+            cache.add(_key(namespace), time.time_ns(), None)
+
+
+def bump_all() -> None:
+    """Устаревает все ключи на поколениях, например после импорта.
+
+    Один incr вместо сдвига каждого затронутого пространства имён.
+    """
+    bump_generation(EPOCH)
+
+
+def bump_on_commit(*namespaces: str) -> None:
+    """Сдвигает поколения после коммита текущей транзакции.
+
+    Сдвиг до коммита позволил бы читателю взять новое поколение вместе
+    со старыми строками и надолго закешировать устаревшую страницу под
+    новым ключом. Вне транзакции поколения сдвигаются сразу.
+    """
+    transaction.on_commit(lambda: bump_generation(*namespaces))
@@ -0,0 +1,201 @@
+"""Замер каждого запроса в продакшене: заголовок Server-Timing и лог.
+
+RequestMetricsMiddleware собирает за запрос общее время, время и
+число запросов к базе (execute_wrapper соединения), время рендеринга
+шаблонов (бэкенд DjangoTemplates отсюда), попадания и промахи кеша
+(бэкенды из core.caches и core.redis_cache) и время работы с
+миниатюрами. Счётчики живут в threading.local и стоят пару
+perf_counter на событие; вне запроса (команды, фоновые потоки) они
+не ведутся.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+from . import metrics as registry
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = registry.Counter(
+    'yatube_requests_total', 'Ответы по страницам и кодам ответа',
+    ('view', 'status'))
+REQUEST_SECONDS = registry.Histogram(
+    'yatube_request_duration_seconds', 'Время ответа страницы, с',
+    ('view',))
+REQUEST_QUERIES = registry.Histogram(
+    'yatube_request_queries', 'Запросов к базе на ответ', ('view',),
+    buckets=(1, 2, 5, 10, 20, 50, 100))
+CACHE_LOOKUPS = registry.Counter(
+    'yatube_cache_lookups_total', 'Ключи, прочитанные из кеша за ответ',
+    ('view', 'result'))
+
+_local = threading.local()
+_MISSING = object()
+
+
+class Metrics:
+    __slots__ = ('db_time', 'queries', 'template_time', 'cache_hits',
+                 'cache_misses', 'thumbnail_time', 'active')
+
+    def __init__(self):
+        self.db_time = self.template_time = self.thumbnail_time = 0.0
+        self.queries = self.cache_hits = self.cache_misses = 0
+        # Замеры, которые уже идут: вложенные не считаются дважды.
+        self.active = set()
+
+    def server_timing(self, total: float) -> str:
+        """Значение заголовка Server-Timing, длительности в мс."""
+        return ', '.join((
+            f'total;dur={total * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="hits={self.cache_hits} '
+            f'misses={self.cache_misses}"',
+            f'thumb;dur={self.thumbnail_time * 1000:.1f}',
+        ))
+
+    def as_dict(self, total: float) -> dict:
+        return {
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(self.db_time * 1000, 2),
+            'queries': self.queries,
+            'template_ms': round(self.template_time * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'thumbnail_ms': round(self.thumbnail_time * 1000, 2),
+        }
+
+
+def current():
+    """Счётчики текущего запроса или None вне запроса."""
+    return getattr(_local, 'metrics', None)
+
+
+@contextmanager
+def timed(field: str):
+    """Прибавляет время блока к полю Metrics, кроме вложенных замеров."""
+    metrics = current()
+    if metrics is None or field in metrics.active:
+        yield
+        return
+    metrics.active.add(field)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.active.discard(field)
+        setattr(metrics, field,
+                getattr(metrics, field) + time.perf_counter() - start)
+
+
+def _count_query(execute, sql, params, many, context):
+    metrics = current()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+class RequestMetricsMiddleware:
+    """Server-Timing, строка JSON в лог и метрики /metrics на запрос.
+
+    Стоит первым в MIDDLEWARE, чтобы total включал остальные
+    middleware. Потоковые ответы отдают тело уже после выхода отсюда,
+    и их чтение из базы в замер не попадает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = _local.metrics = Metrics()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_count_query))
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        total = time.perf_counter() - start
+        response['Server-Timing'] = metrics.server_timing(total)
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        REQUESTS.inc(view=view, status=response.status_code)
+        REQUEST_SECONDS.observe(total, view=view)
+        REQUEST_QUERIES.observe(metrics.queries, view=view)
+        CACHE_LOOKUPS.inc(metrics.cache_hits, view=view, result='hit')
+        CACHE_LOOKUPS.inc(metrics.cache_misses, view=view, result='miss')
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': match and match.view_name,
+                'status': response.status_code,
+                **metrics.as_dict(total),
+            }, ensure_ascii=False))
+        return response
+
+
+class CacheMetricsMixin:
+    """Считает попадания и промахи get и get_many бэкенда кеша."""
+
+    def get(self, key, default=None, version=None, **kwargs):
+        value = super().get(key, _MISSING, version=version, **kwargs)
+        metrics = current()
+        if metrics is not None and 'cache' not in metrics.active:
+            if value is _MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None, **kwargs):
+        keys = list(keys)
+        metrics = current()
+        if metrics is None or 'cache' in metrics.active:
+            return super().get_many(keys, version=version, **kwargs)
+        # BaseCache.get_many зовёт get по ключу: их не считаем отдельно.
+        metrics.active.add('cache')
+        try:
+            found = super().get_many(keys, version=version, **kwargs)
+        finally:
+            metrics.active.discard('cache')
+        metrics.cache_hits += len(found)
+        metrics.cache_misses += len(keys) - len(found)
+        return found
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        with timed('template_time'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """DjangoTemplates, замеряющий рендеринг шаблонов верхнего уровня.
+
+    include и наследование идут внутри движка и входят во время
+    внешнего шаблона; render_to_string из тегов вложен и не
+    прибавляется повторно.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
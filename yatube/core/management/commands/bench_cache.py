@@ -0,0 +1,82 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, _create_cache
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import measure
+
+BATCH = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает задержку попаданий get и get_many '
+        'у бэкендов кеша из CACHE_PRESETS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backends', nargs='+', default=list(settings.CACHE_PRESETS))
+        parser.add_argument('--repeat', type=int, default=1000)
+        parser.add_argument('--value-size', type=int, default=2048)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"backend":>10} {"get p50":>10} {"get p95":>10} '
+            f'{"get_many p50":>13} {"get_many p95":>13}'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name in options['backends']:
+                cache = self.make_cache(name, directory)
+                if cache is None:
+                    self.stdout.write(f'{name:>10} недоступен')
+                    continue
+                self.run_case(name, cache, options)
+
+    def make_cache(self, name: str, directory: str):
+        preset = dict(settings.CACHE_PRESETS[name])
+        if name == 'sqlite':
+            preset['LOCATION'] = os.path.join(directory, 'cache.sqlite3')
+        try:
+            cache = _create_cache(preset.pop('BACKEND'), **preset)
+            cache.set('bench:ping', 1)
+        except InvalidCacheBackendError:
+            return None
+        except Exception:
+            if name != 'redis':
+                raise
+            return self.fake_redis(preset)
+        return cache
+
+    def fake_redis(self, preset: dict):
+        """Без redis-server меряем клиент с пулом через fakeredis."""
+        try:
+            import fakeredis
+        except ImportError:
+            return None
+        self.stdout.write('redis-server недоступен, используется fakeredis')
+        options = dict(preset['OPTIONS'])
+        options['CONNECTION_POOL_KWARGS'] = {
+            **options['CONNECTION_POOL_KWARGS'],
+            'connection_class': fakeredis.FakeConnection,
+            'server': fakeredis.FakeServer(),
+        }
+        # django-redis хранит пулы по URL, поэтому адрес должен отличаться.
+        return _create_cache(
+            'core.redis_cache.RedisCache',
+            LOCATION='redis://fakeredis:6379/1', OPTIONS=options,
+        )
+
+    def run_case(self, name: str, cache, options: dict):
+        value = 'x' * options['value_size']
+        keys = [f'bench:{i}' for i in range(BATCH)]
+        cache.set_many({key: value for key in keys})
+        get = measure(lambda: cache.get(keys[0]), options['repeat'])
+        get_many = measure(lambda: cache.get_many(keys), options['repeat'])
+        cache.delete_many(keys + ['bench:ping'])
+        self.stdout.write(
+            f'{name:>10} {get["p50"]:>8.3f}ms {get["p95"]:>8.3f}ms '
+            f'{get_many["p50"]:>11.3f}ms {get_many["p95"]:>11.3f}ms'
+        )
@@ -0,0 +1,130 @@
+import time
+
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+
+from core import instrumentation
+from core.benchmarks import measure, scratch_database
+from core.caches import LocMemCache as CountingLocMemCache
+from posts.models import Group, Post, User
+
+MIDDLEWARE = 'core.instrumentation.RequestMetricsMiddleware'
+
+
+def uninstrumented() -> override_settings:
+    """Настройки без замеров: middleware, шаблоны и кеш как в Django."""
+    templates = [dict(settings.TEMPLATES[0], BACKEND=(
+        'django.template.backends.django.DjangoTemplates'))]
+    return override_settings(
+        MIDDLEWARE=[name for name in settings.MIDDLEWARE
+                    if name != MIDDLEWARE],
+        TEMPLATES=templates,
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Меряет накладные расходы RequestMetricsMiddleware на страницах '
+        'ленты, группы и поста (во временной БД)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=300)
+        parser.add_argument(
+            '--rounds', type=int, default=5,
+            help='Чередований режимов; берётся лучший p50 каждого')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Цена замера на событие:')
+        for name, cost in self.event_costs():
+            self.stdout.write(f'{name:>24} {cost * 1e6:>7.2f}us')
+        with scratch_database(), override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                CACHES={'default': {'BACKEND': 'core.caches.LocMemCache'}}):
+            reader, urls = self.fill(options['posts'])
+            self.rounds = options['rounds']
+            self.stdout.write(
+                f'{"page":>12} {"off p50":>9} {"on p50":>9} '
+                f'{"off p95":>9} {"on p95":>9} {"overhead":>9}')
+            for name, url in urls.items():
+                self.run_case(name, url, reader, options['repeat'])
+
+    def event_costs(self, repeat: int = 100000):
+        """Разница времени одной операции с замером и без, в секундах."""
+        request = RequestFactory().get('/')
+        view = instrumentation.RequestMetricsMiddleware(
+            lambda request: HttpResponse())
+        plain_cache = LocMemCache('bench-plain', {})
+        counting_cache = CountingLocMemCache('bench-counting', {})
+
+        def execute(sql, params, many, context):
+            return None
+
+        def per_call(func) -> float:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                func()
+            return (time.perf_counter() - start) / repeat
+
+        def in_request(func):
+            instrumentation._local.metrics = instrumentation.Metrics()
+            try:
+                return per_call(func)
+            finally:
+                instrumentation._local.metrics = None
+
+        def template_timing():
+            with instrumentation.timed('template_time'):
+                pass
+
+        return (
+            ('middleware на запрос', per_call(lambda: view(request))
+             - per_call(lambda: HttpResponse())),
+            ('запрос к базе', in_request(
+                lambda: instrumentation._count_query(
+                    execute, '', (), False, {}))
+             - per_call(lambda: execute('', (), False, {}))),
+            ('get кеша', in_request(lambda: counting_cache.get('key'))
+             - per_call(lambda: plain_cache.get('key'))),
+            ('замер шаблона', in_request(template_timing)),
+        )
+
+    def run_case(self, name: str, url: str, reader, repeat: int):
+        client = Client()
+        client.force_login(reader)
+        results = {'off': [], 'on': []}
+        # Поочерёдно, чтобы прогрев и фон машины влияли на оба режима.
+        for _ in range(self.rounds):
+            with uninstrumented():
+                results['off'].append(measure(lambda: client.get(url), repeat))
+            results['on'].append(measure(lambda: client.get(url), repeat))
+        off, on = (
+            min(timings, key=lambda timing: timing['p50'])
+            for timings in (results['off'], results['on']))
+        self.stdout.write(
+            f'{name:>12} {off["p50"]:>7.3f}ms {on["p50"]:>7.3f}ms '
+            f'{off["p95"]:>7.3f}ms {on["p95"]:>7.3f}ms '
+            f'{(on["p50"] - off["p50"]) * 1000:>7.0f}us'
+        )
+
+    def fill(self, total: int):
+        author = User.objects.create_user(username='bench_metrics_author')
+        group = Group.objects.create(
+            title='Группа', slug='bench-metrics', description='')
+        Post.objects.bulk_create(
+            Post(author=author, group=group, text=f'Пост {i} ' * 20)
+            for i in range(total))
+        post = Post.objects.first()
+        reader = User.objects.create_user(username='bench_metrics_reader')
+        return reader, {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list', args=(group.slug,)),
+            'post_detail': reverse('posts:post_detail', args=(post.pk,)),
+        }
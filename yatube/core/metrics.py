@@ -0,0 +1,334 @@
+"""Метрики процесса: счётчики, gauge и гистограммы в формате Prometheus.
+
+Значения меняются под общей блокировкой, поэтому метрики можно
+трогать из любых потоков. Без METRICS_DIR они живут в памяти процесса.
+С METRICS_DIR каждый процесс (воркер gunicorn) пишет их в свой файл
+<pid>.db, отображённый в память, и выдача складывает файлы всех
+процессов: счётчики и гистограммы — всех, кто когда-либо писал, gauge —
+только живых. Каталог очищается при перезапуске сервера, иначе
+счётчики прошлых запусков так и будут входить в сумму.
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+
+INITIAL_SIZE = 1 << 16
+# Файл: занятая длина (uint32 и выравнивание), затем записи
+# [длина ключа uint32][ключ, дополненный до 8 байт][значение double].
+_USED = struct.Struct('<I')
+_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+_HEADER_SIZE = 8
+
+
+def _entries(data, used: int):
+    """(ключ, значение, позиция значения) записей файла метрик."""
+    position = _HEADER_SIZE
+    while position < used:
+        length = _LENGTH.unpack_from(data, position)[0]
+        start = position + _LENGTH.size
+        key = bytes(data[start:start + length]).decode()
+        position = start + length + (-(_LENGTH.size + length) % 8)
+        yield key, _VALUE.unpack_from(data, position)[0], position
+        position += _VALUE.size
+
+
+def read_file(path: str) -> dict:
+    with open(path, 'rb') as source:
+        data = source.read()
+    if len(data) < _HEADER_SIZE:
+        return {}
+    used = _USED.unpack_from(data, 0)[0]
+    return {key: value for key, value, _ in _entries(data, used)}
+
+
+class MemoryStore:
+    def __init__(self):
+        self.values = {}
+
+    def add(self, key: str, amount: float) -> None:
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def set(self, key: str, value: float) -> None:
+        self.values[key] = value
+
+    def items(self) -> dict:
+        return dict(self.values)
+
+
+class MmapStore:
+    """Значения процесса в файле, отображённом в память.
+
+    Пишет только сам процесс, остальные лишь читают файл, поэтому
+    блокировок между процессами не нужно: длина занятой части
+    обновляется после записи новой строки.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'a+b')
+        capacity = os.fstat(self.file.fileno()).st_size
+        if capacity < INITIAL_SIZE:
+            capacity = INITIAL_SIZE
+            self.file.truncate(capacity)
+        self.map = mmap.mmap(self.file.fileno(), capacity)
+        self.used = _USED.unpack_from(self.map, 0)[0] or _HEADER_SIZE
+        self.positions = {
+            key: position
+            for key, _, position in _entries(self.map, self.used)
+        }
+
+    def position(self, key: str) -> int:
+        position = self.positions.get(key)
+        if position is not None:
+            return position
+        encoded = key.encode()
+        padding = -(_LENGTH.size + len(encoded)) % 8
+        entry = (_LENGTH.pack(len(encoded)) + encoded + b' ' * padding
+                 + _VALUE.pack(0.0))
+        while self.used + len(entry) > len(self.map):
+            capacity = len(self.map) * 2
+            self.map.close()
+            self.file.truncate(capacity)
+            self.map = mmap.mmap(self.file.fileno(), capacity)
+        self.map[self.used:self.used + len(entry)] = entry
+        self.used += len(entry)
+        _USED.pack_into(self.map, 0, self.used)
+        position = self.positions[key] = self.used - _VALUE.size
+        return position
+
+    def add(self, key: str, amount: float) -> None:
+        position = self.position(key)
+        value = _VALUE.unpack_from(self.map, position)[0]
+        _VALUE.pack_into(self.map, position, value + amount)
+
+    def set(self, key: str, value: float) -> None:
+        _VALUE.pack_into(self.map, self.position(key), value)
+
+    def items(self) -> dict:
+        return {
+            key: _VALUE.unpack_from(self.map, position)[0]
+            for key, position in self.positions.items()
+        }
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._store = None
+        self._pid = None
+
+    def register(self, metric) -> None:
+        if metric.name in self.metrics:
+            raise ValueError(f'Метрика {metric.name} уже есть')
+        self.metrics[metric.name] = metric
+
+    def store(self):
+        # После fork (gunicorn --preload) у воркера свой файл.
+        pid = os.getpid()
+        if self._pid != pid:
+            directory = settings.METRICS_DIR
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+                self._store = MmapStore(
+                    os.path.join(directory, f'{pid}.db'))
+            else:
+                self._store = MemoryStore()
+            self._pid = pid
+        return self._store
+
+    def add(self, key: str, amount: float) -> None:
+        with self.lock:
+            self.store().add(key, amount)
+
+    def set(self, key: str, value: float) -> None:
+        with self.lock:
+            self.store().set(key, value)
+
+    def collect(self) -> dict:
+        """Значения всех процессов: ключ -> сумма."""
+        with self.lock:
+            own = self.store().items()
+        directory = settings.METRICS_DIR
+        if not directory:
+            return own
+        totals = {}
+        for name in os.listdir(directory):
+            pid, extension = os.path.splitext(name)
+            if extension != '.db' or not pid.isdigit():
+                continue
+            live = _alive(int(pid))
+            values = (own if int(pid) == os.getpid()
+                      else read_file(os.path.join(directory, name)))
+            for key, value in values.items():
+                family = json.loads(key)[0]
+                metric = self.metrics.get(family)
+                if metric is None or (metric.kind == 'gauge' and not live):
+                    continue
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus 0.0.4."""
+        samples = {}
+        for key, value in self.collect().items():
+            family, suffix, labels = json.loads(key)
+            samples.setdefault(family, []).append(
+                (suffix, [tuple(pair) for pair in labels], value))
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for suffix, labels, value in metric.samples(
+                    samples.get(name, [])):
+                lines.append(
+                    f'{name}{suffix}{_format_labels(labels)} '
+                    f'{_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return (value.replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return f'{{{pairs}}}'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames=(),
+                 registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self._keys = {}
+        registry.register(self)
+
+    def key(self, suffix: str, labels: dict, extra=()) -> str:
+        if len(labels) != len(self.labelnames) \
+                or not all(name in labels for name in self.labelnames):
+            raise ValueError(
+                f'{self.name}: ожидались метки {self.labelnames}')
+        values = tuple(str(labels[name]) for name in self.labelnames)
+        cache_key = (suffix, values, extra)
+        key = self._keys.get(cache_key)
+        if key is None:
+            key = self._keys[cache_key] = json.dumps(
+                [self.name, suffix,
+                 list(zip(self.labelnames, values)) + list(extra)],
+                ensure_ascii=False)
+        return key
+
+    def samples(self, samples: list) -> list:
+        return sorted(samples, key=lambda sample: sample[:2])
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if amount < 0:
+            raise ValueError('Счётчик только растёт')
+        if amount:
+            self.registry.add(self.key('', labels), amount)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        self.registry.set(self.key('', labels), value)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        self.registry.add(self.key('', labels), amount)
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Гистограмма с постоянными корзинами; последняя — +Inf.
+
+    В хранилище лежит число наблюдений в каждой корзине отдельно, а
+    накопленные значения le считаются при выдаче.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(),
+                 buckets=DEFAULT_BUCKETS, registry: Registry = REGISTRY):
+        buckets = tuple(sorted(float(bound) for bound in buckets))
+        if buckets[-1] != math.inf:
+            buckets += (math.inf,)
+        self.buckets = buckets
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, **labels) -> None:
+        bound = self.buckets[bisect_left(self.buckets, value)]
+        registry = self.registry
+        with registry.lock:
+            store = registry.store()
+            store.add(self.key(
+                '_bucket', labels, (('le', _format_value(bound)),)), 1)
+            store.add(self.key('_sum', labels), value)
+            store.add(self.key('_count', labels), 1)
+
+    def samples(self, samples: list) -> list:
+        by_labels = {}
+        for suffix, labels, value in samples:
+            series = by_labels.setdefault(
+                tuple(pair for pair in labels if pair[0] != 'le'), {})
+            if suffix == '_bucket':
+                series[dict(labels)['le']] = value
+            else:
+                series[suffix] = value
+        result = []
+        for labels, series in sorted(by_labels.items()):
+            total = 0.0
+            for bound in self.buckets:
+                le = _format_value(bound)
+                total += series.get(le, 0.0)
+                result.append(
+                    ('_bucket', list(labels) + [('le', le)], total))
+            result.append(('_sum', list(labels), series.get('_sum', 0.0)))
+            result.append(
+                ('_count', list(labels), series.get('_count', 0.0)))
+        return result
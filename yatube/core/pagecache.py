@@ -0,0 +1,91 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+
+from .generations import get_generations
+
+KEY_PREFIX = 'page'
+
+
+def add_cache_tags(request, *tags) -> None:
+    """Помечает ответ тегами: он сбросится при смене их поколений."""
+    request.cache_tags = getattr(request, 'cache_tags', set()) | set(tags)
+
+
+def page_etag(request, *namespaces) -> str:
+    """ETag страницы из поколений её тегов, адреса и посетителя.
+
+    Считается одним get_many к кешу, без запросов к базе. В него входят
+    CSRF-cookie (форма на странице несёт токен) и поколение самого
+    пользователя (его имя выводится в шапке). Прочитанные поколения
+    остаются в request.page_generations для cache_anonymous_page.
+    """
+    user = request.user
+    if user.is_authenticated:
+        namespaces += (f'author:{user.pk}',)
+    generations = request.page_generations = get_generations(namespaces)
+    payload = repr((
+        request.get_full_path(),
+        user.pk,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+        sorted(generations.items()),
+    ))
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def _cacheable_request(request) -> bool:
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+    )
+
+
+def _cacheable_response(request, response) -> bool:
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # Страница с формой несёт CSRF-токен конкретного посетителя.
+        and not request.META.get('CSRF_COOKIE_USED')
+        and getattr(request, 'cache_tags', None)
+    )
+
+
+def cache_anonymous_page(view):
+    """Кеширует страницу целиком для анонимных посетителей.
+
+    Вместе с ответом хранятся поколения его тегов (post:<id>,
+    author:<id>, author_posts:<id>, group:<id>, posts). Ответ отдаётся
+    из кеша, только если ни один тег не сдвинулся; сдвигают их сигналы
+    моделей. Сохранённый ETag проверяется тут же, и повторный запрос
+    получает 304.
+
+    Поколения ETag (page_etag) прочитаны до запросов представления к
+    базе и сохраняются такими, какими были: запись, закоммиченная во
+    время рендера, сдвинет их, и следующий запрос перерисует страницу,
+    а не получит старую под новым поколением.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable_request(request):
+            return view(request, *args, **kwargs)
+        url = request.build_absolute_uri().encode()
+        key = f'{KEY_PREFIX}:{hashlib.md5(url).hexdigest()}'
+        cached = cache.get(key)
+        if cached is not None:
+            tags, response = cached
+            if get_generations(tags) == tags:
+                return get_conditional_response(
+                    request, etag=response.get('ETag'), response=response)
+        response = view(request, *args, **kwargs)
+        if _cacheable_response(request, response):
+            before = getattr(request, 'page_generations', {})
+            tags = get_generations(request.cache_tags - before.keys())
+            tags.update(before)
+            cache.set(
+                key, (tags, response), settings.ANONYMOUS_PAGE_CACHE_TTL)
+        return response
+    return wrapper
@@ -0,0 +1,115 @@
+import logging
+import re
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+logger = logging.getLogger(__name__)
+
+Budget = namedtuple('Budget', 'queries duplicates')
+
+# Строки и числа в SQL: без них запросы N+1 выглядят одинаково.
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LIST = re.compile(r'\(\?(?:, \?)*\)')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def fingerprint(sql: str) -> str:
+    """Запрос без значений: id 1 и id 2 дают один отпечаток."""
+    return IN_LIST.sub('(?)', LITERALS.sub('?', sql))
+
+
+def duplicate_count(queries) -> int:
+    """Сколько запросов повторяют уже выполненный с другими значениями."""
+    counts = Counter(fingerprint(query['sql']) for query in queries)
+    return sum(count - 1 for count in counts.values())
+
+
+def budget_for(view_name: str):
+    limits = settings.QUERY_BUDGETS.get(view_name)
+    return limits and Budget(*limits)
+
+
+def violations(view_name: str, queries) -> list:
+    """Превышения бюджета страницы; у страницы без бюджета их нет."""
+    budget = budget_for(view_name)
+    if budget is None:
+        return []
+    problems = []
+    if len(queries) > budget.queries:
+        problems.append(
+            f'{view_name}: {len(queries)} запросов при бюджете '
+            f'{budget.queries}')
+    duplicates = duplicate_count(queries)
+    if duplicates > budget.duplicates:
+        problems.append(
+            f'{view_name}: {duplicates} повторов при бюджете '
+            f'{budget.duplicates}')
+    return problems
+
+
+def describe(queries) -> str:
+    return '\n'.join(
+        f'{number}. {query["sql"]}'
+        for number, query in enumerate(queries, start=1))
+
+
+class QueryBudgetMiddleware:
+    """В DEBUG сверяет запросы к базе каждой страницы с QUERY_BUDGETS.
+
+    Превышение пишется в лог с текстом запросов, а при
+    QUERY_BUDGET_STRICT ответ заменяется исключением. Без DEBUG
+    middleware отключается и ничего не стоит.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with CaptureQueriesContext(connection) as context:
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is None:
+            return response
+        queries = context.captured_queries
+        problems = violations(match.view_name, queries)
+        if problems:
+            message = '\n'.join(problems + [describe(queries)])
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class QueryBudgetMixin:
+    """Проверка бюджета запросов для тестов на TestCase."""
+
+    def assertWithinBudget(self, url: str, client=None, method: str = 'get',
+                           data=None):
+        """Выполняет запрос и проверяет, что страница уложилась в бюджет.
+
+        Возвращает ответ; число запросов — в его атрибуте query_count.
+        """
+        client = client or self.client
+        view_name = resolve(url.split('?')[0]).view_name
+        self.assertIsNotNone(
+            budget_for(view_name), f'Нет бюджета запросов для {view_name}')
+        # Данные GET заменили бы строку запроса из url.
+        args = (url,) if data is None else (url, data)
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(client, method)(*args)
+        queries = context.captured_queries
+        problems = violations(view_name, queries)
+        if problems:
+            self.fail('\n'.join(problems + [describe(queries)]))
+        response.query_count = len(queries)
+        return response
@@ -0,0 +1,12 @@
+"""RedisCache со счётчиками попаданий для Server-Timing.
+
+Отдельным модулем: django_redis импортируется долго и нужен, только
+когда выбран пресет redis.
+"""
+from django_redis.cache import RedisCache as BaseRedisCache
+
+from .instrumentation import CacheMetricsMixin
+
+
+class RedisCache(CacheMetricsMixin, BaseRedisCache):
+    pass
@@ -0,0 +1,232 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# SQLite ограничивает число параметров в одном запросе.
+MAX_PARAMS = 900
+
+
+class SQLiteCache(BaseCache):
+    """Общий для всех процессов хоста кеш в одном файле SQLite.
+
+    Файл открыт в режиме WAL, поэтому чтения не ждут записей. Каждый
+    поток держит своё соединение (пул на поток), get_many и set_many
+    выполняются одним запросом или одной транзакцией, incr атомарен
+    между процессами за счёт BEGIN IMMEDIATE.
+
+    Размер проверяется не чаще раза в OPTIONS['CULL_INTERVAL'] секунд
+    (по умолчанию 60): между проверками кеш может превысить
+    MAX_ENTRIES. Сверх лимита удаляется доля 1/CULL_FREQUENCY записей,
+    начиная с тех, что истекут раньше; ключи без срока (счётчики
+    поколений) удаляются последними.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        options = params.get('OPTIONS', {})
+        self._cull_interval = float(options.get('CULL_INTERVAL', 60))
+        self._next_cull = 0.0
+
+    @property
+    def _db(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL'
+                ') WITHOUT ROWID'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+            self._local.connection = connection
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        # Момент истечения в секундах эпохи или None — без срока.
+        return self.get_backend_timeout(timeout)
+
+    @staticmethod
+    def _alive(expires, now):
+        return expires is None or expires > now
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _maybe_cull(self):
+        now = time.monotonic()
+        if now < self._next_cull:
+            return
+        self._next_cull = now + self._cull_interval
+        db = self._db
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        total = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if total <= self._max_entries:
+            return
+        if not self._cull_frequency:
+            db.execute('DELETE FROM cache')
+            return
+        excess = total // self._cull_frequency
+        excess -= db.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache WHERE expires IS NOT NULL '
+            'ORDER BY expires LIMIT ?)',
+            (excess,),
+        ).rowcount
+        if excess > 0:
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache WHERE expires IS NULL LIMIT ?)',
+                (excess,),
+            )
+
+    def get(self, key, default=None, version=None):
+        row = self._db.execute(
+            'SELECT value, expires FROM cache WHERE key = ?',
+            (self._key(key, version),),
+        ).fetchone()
+        if row is None or not self._alive(row[1], time.time()):
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found, now, names = {}, time.time(), list(keys)
+        for start in range(0, len(names), MAX_PARAMS):
+            chunk = names[start:start + MAX_PARAMS]
+            rows = self._db.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN '
+                f'({",".join("?" * len(chunk))})',
+                chunk,
+            )
+            for name, value, expires in rows:
+                if self._alive(expires, now):
+                    found[keys[name]] = pickle.loads(value)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._db.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (self._key(key, version), self._dumps(value),
+             self._expires(timeout)),
+        )
+        self._maybe_cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expires(timeout)
+        rows = [
+            (self._key(key, version), self._dumps(value), expires)
+            for key, value in data.items()
+        ]
+        db = self._db
+        db.execute('BEGIN')
+        try:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                rows,
+            )
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        self._maybe_cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()),
+            )
+            cursor = db.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, self._dumps(value), self._expires(timeout)),
+            )
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or not self._alive(row[1], time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self._dumps(value), key),
+            )
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._expires(timeout), self._key(key, version), time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        row = self._db.execute(
+            'SELECT expires FROM cache WHERE key = ?',
+            (self._key(key, version),),
+        ).fetchone()
+        return row is not None and self._alive(row[0], time.time())
+
+    def delete(self, key, version=None):
+        self._db.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),))
+
+    def delete_many(self, keys, version=None):
+        names = [self._key(key, version) for key in keys]
+        for start in range(0, len(names), MAX_PARAMS):
+            chunk = names[start:start + MAX_PARAMS]
+            self._db.execute(
+                'DELETE FROM cache WHERE key IN '
+                f'({",".join("?" * len(chunk))})',
+                chunk,
+            )
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединения живут весь процесс: это и есть пул.
+        pass
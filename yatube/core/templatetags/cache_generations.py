@@ -0,0 +1,11 @@
+from django import template
+
+from core.generations import get_generation
+
+register = template.Library()
+
+
+@register.simple_tag
+def generation(namespace, *parts):
+    """{% generation 'group' group.pk as gen %} — поколение для {% cache %}."""
+    return get_generation(':'.join(str(part) for part in (namespace,) + parts))
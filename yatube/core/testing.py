@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class OnCommitMixin:
+    """captureOnCommitCallbacks из Django 3.2 для TestCase на Django 2.2.
+
+    TestCase не фиксирует транзакцию, и колбэки on_commit (сдвиг
+    поколений кеша, постановка миниатюр) без него не выполняются.
+    """
+
+    @classmethod
+    @contextmanager
+    def captureOnCommitCallbacks(cls, *, using=DEFAULT_DB_ALIAS,
+                                 execute=False):
+        callbacks = []
+        start = len(connections[using].run_on_commit)
+        try:
+            yield callbacks
+        finally:
+            # Колбэк может поставить новый: выполняем, пока они есть.
+            while True:
+                pending = connections[using].run_on_commit
+                count = len(pending)
+                for _, callback in pending[start:]:
+                    callbacks.append(callback)
+                    if execute:
+                        callback()
+                if count == len(connections[using].run_on_commit):
+                    break
+                start = count
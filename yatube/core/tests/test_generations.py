@@ -0,0 +1,30 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from core.generations import get_generation
+from posts.models import Group
+
+
+class GenerationBumpTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_waits_for_commit(self):
+        """ Запись в транзакции сдвигает поколение только после коммита """
+        before = get_generation('groups')
+        with transaction.atomic():
+            Group.objects.create(
+                title='Группа', slug='generation', description='')
+            self.assertEqual(get_generation('groups'), before)
+        self.assertNotEqual(get_generation('groups'), before)
+
+    def test_rollback_keeps_generation(self):
+        """ Откат транзакции не сдвигает поколение """
+        before = get_generation('groups')
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Group.objects.create(
+                    title='Группа', slug='rollback', description='')
+                raise RuntimeError
+        self.assertEqual(get_generation('groups'), before)
@@ -0,0 +1,75 @@
+import json
+import logging
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from core.instrumentation import RequestMetricsMiddleware
+from posts.models import Post
+
+User = get_user_model()
+
+
+def timing(response) -> dict:
+    """Метрики Server-Timing: имя -> {'dur': ..., 'desc': ...}."""
+    metrics = {}
+    for entry in response['Server-Timing'].split(', '):
+        name, *params = entry.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='measured')
+        cls.post = Post.objects.create(author=cls.user, text='Замер')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_server_timing_header(self):
+        """ Ответ несёт Server-Timing с базой, шаблонами и кешем """
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)))
+        metrics = timing(response)
+        self.assertEqual(
+            set(metrics), {'total', 'db', 'tpl', 'cache', 'thumb'})
+        queries = int(re.match(r'"(\d+) queries"', metrics['db']['desc'])[1])
+        self.assertGreater(queries, 0)
+        self.assertGreater(float(metrics['tpl']['dur']), 0)
+        self.assertGreaterEqual(
+            float(metrics['total']['dur']), float(metrics['db']['dur']))
+        self.assertRegex(metrics['cache']['desc'], r'"hits=\d+ misses=\d+"')
+
+    def test_cache_hits_and_misses(self):
+        """ get и get_many считают попадания и промахи по ключам """
+        def view(request):
+            cache.set('present', 1)
+            cache.get('present')
+            cache.get('absent', 'по умолчанию')
+            cache.get_many(['present', 'absent', 'other'])
+            return HttpResponse()
+
+        response = RequestMetricsMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(
+            timing(response)['cache']['desc'], '"hits=2 misses=3"')
+
+    def test_log_line(self):
+        """ На уровне INFO каждый запрос пишется строкой JSON """
+        url = reverse('posts:index')
+        with self.assertLogs('core.instrumentation', logging.INFO) as logs:
+            response = self.client.get(url)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], url)
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(
+            f'"{record["queries"]} queries"', timing(response)['db']['desc'])
@@ -0,0 +1,135 @@
+import base64
+import os
+import shutil
+import tempfile
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import (CONTENT_TYPE, Counter, Gauge, Histogram,
+                          MmapStore, Registry)
+
+User = get_user_model()
+
+# pid, которого нет в системе: max_pid в Linux не больше 2**22.
+DEAD_PID = 2 ** 22 + 1
+
+
+class MetricsRegistryTests(TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_render_counter_gauge_histogram(self):
+        """ Выдача в формате Prometheus с накопленными корзинами """
+        requests = Counter('requests_total', 'Запросы', ('view',),
+                           registry=self.registry)
+        queue = Gauge('queue', 'Очередь', registry=self.registry)
+        seconds = Histogram('seconds', 'Время', ('view',),
+                            buckets=(0.1, 1), registry=self.registry)
+        requests.inc(view='posts:index')
+        requests.inc(2, view='posts:index')
+        requests.inc(view='a"b\\c\nd')
+        queue.set(5)
+        queue.dec(2)
+        for value in (0.05, 0.5, 0.5, 7):
+            seconds.observe(value, view='posts:index')
+        lines = self.registry.render().splitlines()
+        for expected in (
+            '# HELP requests_total Запросы',
+            '# TYPE requests_total counter',
+            'requests_total{view="posts:index"} 3',
+            'requests_total{view="a\\"b\\\\c\\nd"} 1',
+            '# TYPE queue gauge',
+            'queue 3',
+            '# TYPE seconds histogram',
+            'seconds_bucket{view="posts:index",le="0.1"} 1',
+            'seconds_bucket{view="posts:index",le="1"} 3',
+            'seconds_bucket{view="posts:index",le="+Inf"} 4',
+            'seconds_sum{view="posts:index"} 8.05',
+            'seconds_count{view="posts:index"} 4',
+        ):
+            with self.subTest(line=expected):
+                self.assertIn(expected, lines)
+        with self.assertRaises(ValueError):
+            requests.inc(view='posts:index', status=200)
+
+    def test_threads_do_not_lose_increments(self):
+        """ Счётчик из нескольких потоков не теряет прибавлений """
+        counter = Counter('hits_total', 'Попадания', registry=self.registry)
+
+        def work():
+            for _ in range(2000):
+                counter.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIn('hits_total 16000', self.registry.render())
+
+    def test_files_of_all_processes_are_summed(self):
+        """ С METRICS_DIR выдача складывает файлы процессов, а gauge
+        умерших процессов не учитывает """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(METRICS_DIR=directory):
+            hits = Counter('hits_total', 'Попадания', ('view',),
+                           registry=self.registry)
+            queue = Gauge('queue', 'Очередь', registry=self.registry)
+            hits.inc(2, view='index')
+            queue.set(1)
+            # Умерший воркер успел записать свои значения.
+            other = MmapStore(os.path.join(directory, f'{DEAD_PID}.db'))
+            other.add(hits.key('', {'view': 'index'}), 3)
+            other.add(hits.key('', {'view': 'group'}), 1)
+            other.set(queue.key('', {}), 10)
+            lines = self.registry.render().splitlines()
+        self.assertIn('hits_total{view="index"} 5', lines)
+        self.assertIn('hits_total{view="group"} 1', lines)
+        self.assertIn('queue 1', lines)
+
+
+class MetricsEndpointTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(
+            username='metrics_staff', password='scrape-me', is_staff=True)
+        cls.user = User.objects.create_user(username='metrics_user')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('metrics')
+
+    def test_only_staff_can_read(self):
+        """ /metrics: гостю 401, не персоналу 403 """
+        response = Client().get(self.url)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Basic', response['WWW-Authenticate'])
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(client.get(self.url).status_code, 403)
+
+    def test_staff_reads_request_metrics(self):
+        """ Персонал видит метрики страниц сессией и по HTTP Basic """
+        Client().get(reverse('posts:index'))
+        client = Client()
+        client.force_login(self.staff)
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], CONTENT_TYPE)
+        body = response.content.decode()
+        self.assertRegex(
+            body, r'yatube_requests_total\{view="posts:index",status="200"\}')
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket{view="posts:index",'
+            'le="+Inf"}', body)
+        self.assertIn('# TYPE yatube_thumbnail_queue gauge', body)
+        credentials = base64.b64encode(b'metrics_staff:scrape-me').decode()
+        response = Client().get(
+            self.url, HTTP_AUTHORIZATION=f'Basic {credentials}')
+        self.assertEqual(response.status_code, 200)
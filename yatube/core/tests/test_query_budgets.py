@@ -0,0 +1,189 @@
+import logging
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from core.querybudget import (QueryBudgetExceeded, QueryBudgetMiddleware,
+                              QueryBudgetMixin, duplicate_count)
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+NAMESPACES = ('posts', 'api', 'users', 'about')
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='budget_reader', is_staff=True)
+        self.author = User.objects.create_user(username='budget_author')
+        self.stranger = User.objects.create_user(username='budget_stranger')
+        self.group = Group.objects.create(
+            title='Группа', slug='budget', description='Описание')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост про бюджет')
+        self.own_post = Post.objects.create(
+            author=self.user, group=self.group, text='Свой пост')
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        Follow.objects.create(user=self.user, author=self.author)
+        self.reader = Client()
+        self.reader.force_login(self.user)
+
+    def grow(self, scale: int = 3) -> None:
+        """Данных больше, чем помещается на страницу, у многих авторов."""
+        authors = [
+            User.objects.create_user(username=f'budget_author_{i}')
+            for i in range(scale * 5)
+        ]
+        groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'budget-{i}', description='')
+            for i in range(scale)
+        ]
+        for i in range(scale * settings.POST_QUANTITY):
+            Post.objects.create(
+                author=authors[i % len(authors)], group=groups[i % scale],
+                text=f'Пост про бюджет {i}')
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Ещё пост {i}')
+        for author in authors:
+            Follow.objects.create(user=self.user, author=author)
+            Comment.objects.create(
+                post=self.post, author=author, text='Комментарий')
+
+    def cases(self) -> list:
+        """(адрес, клиент, метод, данные) для каждой именованной страницы."""
+        anonymous = Client()
+        post_id, own_id = self.post.pk, self.own_post.pk
+        author = self.author.username
+        stranger = self.stranger.username
+        return [
+            (reverse('posts:index'), self.reader, 'get', None),
+            (reverse('posts:index'), anonymous, 'get', None),
+            (reverse('posts:group_list', args=(self.group.slug,)),
+             self.reader, 'get', None),
+            (reverse('posts:profile', args=(author,)),
+             self.reader, 'get', None),
+            (reverse('posts:post_detail', args=(post_id,)),
+             self.reader, 'get', None),
+            (reverse('posts:post_detail', args=(post_id,)),
+             anonymous, 'get', None),
+            (reverse('posts:post_comments', args=(post_id,)),
+             self.reader, 'get', None),
+            (reverse('posts:post_create'), self.reader, 'get', None),
+            (reverse('posts:post_edit', args=(own_id,)),
+             self.reader, 'get', None),
+            (reverse('posts:add_comment', args=(post_id,)),
+             self.reader, 'post', {'text': 'Ещё комментарий'}),
+            (reverse('posts:search') + '?q=бюджет',
+             self.reader, 'get', None),
+            (reverse('posts:follow_index'), self.reader, 'get', None),
+            (reverse('posts:profile_follow', args=(stranger,)),
+             self.reader, 'get', None),
+            (reverse('posts:profile_unfollow', args=(stranger,)),
+             self.reader, 'get', None),
+            (reverse('api:index'), self.reader, 'get', None),
+            (reverse('api:group_list', args=(self.group.slug,)),
+             self.reader, 'get', None),
+            (reverse('api:profile', args=(author,)),
+             self.reader, 'get', None),
+            (reverse('api:post_detail', args=(post_id,)),
+             self.reader, 'get', None),
+            (reverse('api:follow_index'), self.reader, 'get', None),
+            (reverse('api:export', args=('posts',)),
+             self.reader, 'get', None),
+            (reverse('users:signup'), anonymous, 'get', None),
+            (reverse('users:login'), anonymous, 'get', None),
+            (reverse('users:logout'), anonymous, 'get', None),
+            (reverse('users:password_change'), self.reader, 'get', None),
+            (reverse('users:password_change_done'),
+             self.reader, 'get', None),
+            (reverse('users:password_reset'), anonymous, 'get', None),
+            (reverse('users:password_reset_done'), anonymous, 'get', None),
+            (reverse('users:password_reset_confirm',
+                     args=('MQ', 'set-password')), anonymous, 'get', None),
+            (reverse('users:password_reset_complete'),
+             anonymous, 'get', None),
+            (reverse('about:author'), anonymous, 'get', None),
+            (reverse('about:tech'), anonymous, 'get', None),
+        ]
+
+    def measure(self) -> list:
+        counts = []
+        for url, client, method, data in self.cases():
+            with self.subTest(url=url, method=method):
+                cache.clear()
+                response = self.assertWithinBudget(
+                    url, client, method, data)
+                self.assertLess(response.status_code, 400)
+                counts.append((url, response.query_count))
+        return counts
+
+    def test_every_view_has_budget(self):
+        """ У каждой именованной страницы приложений есть бюджет """
+        for namespace in NAMESPACES:
+            for pattern in import_module(f'{namespace}.urls').urlpatterns:
+                view_name = f'{namespace}:{pattern.name}'
+                with self.subTest(view_name=view_name):
+                    self.assertIn(view_name, settings.QUERY_BUDGETS)
+
+    def test_query_count_does_not_grow_with_data(self):
+        """ Страницы укладываются в бюджет, и запросов не больше с ростом
+        данных """
+        small = self.measure()
+        self.grow()
+        large = self.measure()
+        self.assertEqual(large, small)
+
+    @override_settings(TIMELINE_PULL_THRESHOLD=1)
+    def test_follow_index_reads_pulled_authors_at_once(self):
+        """ Посты популярных авторов лента читает одним запросом, сколько
+        бы их ни было в подписках """
+        url = reverse('posts:follow_index')
+        counts = []
+        for i in range(3):
+            star = User.objects.create_user(username=f'budget_star_{i}')
+            Follow.objects.create(user=self.user, author=star)
+            Follow.objects.create(user=self.stranger, author=star)
+            for j in range(settings.POST_QUANTITY):
+                Post.objects.create(author=star, text=f'Пост звезды {j}')
+            cache.clear()
+            response = self.assertWithinBudget(url, self.reader)
+            self.assertEqual(response.status_code, 200)
+            counts.append(response.query_count)
+        self.assertEqual(counts, [counts[0]] * 3)
+
+    def test_duplicates_ignore_values(self):
+        """ Запросы, различающиеся только значениями, — повторы """
+        queries = [
+            {'sql': 'SELECT * FROM "auth_user" WHERE "id" = 1'},
+            {'sql': 'SELECT * FROM "auth_user" WHERE "id" = 2'},
+            {'sql': "SELECT * FROM \"posts_group\" WHERE \"slug\" = 'a'"},
+            {'sql': 'SELECT * FROM "posts_post" WHERE "id" IN (1, 2)'},
+            {'sql': 'SELECT * FROM "posts_post" WHERE "id" IN (3)'},
+        ]
+        self.assertEqual(duplicate_count(queries), 2)
+
+    @override_settings(
+        DEBUG=True, QUERY_BUDGETS={'about:tech': (0, 0)})
+    def test_middleware_reports_over_budget(self):
+        """ В DEBUG middleware пишет превышение в лог или падает """
+        def view(request):
+            User.objects.count()
+            return 'ответ'
+
+        request = RequestFactory().get(reverse('about:tech'))
+        request.resolver_match = resolve(request.path)
+        middleware = QueryBudgetMiddleware(view)
+        with self.assertLogs('core.querybudget', logging.WARNING) as logs:
+            self.assertEqual(middleware(request), 'ответ')
+        self.assertIn('about:tech: 1 запросов при бюджете 0',
+                      logs.output[0])
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                middleware(request)
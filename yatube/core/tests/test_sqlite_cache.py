@@ -0,0 +1,76 @@
+import os
+import tempfile
+import time
+
+from django.core.cache import _create_cache
+from django.test import SimpleTestCase
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = self.open_cache()
+
+    def open_cache(self, **options):
+        return _create_cache(
+            'core.sqlite_cache.SQLiteCache', LOCATION=self.location,
+            OPTIONS=options)
+
+    def test_get_set_many(self):
+        """get_many отдаёт только живые ключи, set_many пишет все."""
+        self.cache.set_many({'a': 1, 'b': [2]})
+        self.cache.set('gone', 3, timeout=-1)
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'gone', 'missing']),
+            {'a': 1, 'b': [2]},
+        )
+        self.assertIsNone(self.cache.get('gone'))
+
+    def test_add_and_incr(self):
+        """add не перезаписывает живой ключ, incr атомарно прибавляет."""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 10))
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_add_replaces_expired(self):
+        """Истёкший ключ можно занять заново через add."""
+        self.cache.set('key', 'old', timeout=0.01)
+        time.sleep(0.02)
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_shared_between_instances(self):
+        """Два экземпляра на одном файле видят записи и удаления друг друга."""
+        other = self.open_cache()
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        other.delete_many(['key'])
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_cull_keeps_keys_without_timeout(self):
+        """Чистка сверх MAX_ENTRIES не трогает ключи без срока."""
+        cache = self.open_cache(
+            MAX_ENTRIES=10, CULL_FREQUENCY=2, CULL_INTERVAL=0)
+        cache.set('generation:posts', 1, timeout=None)
+        for i in range(30):
+            cache.set(f'page:{i}', i, timeout=60 + i)
+        self.assertEqual(cache.get('generation:posts'), 1)
+        self.assertIsNone(cache.get('page:0'))
+        self.assertEqual(cache.get('page:29'), 29)
+        total = cache._db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        self.assertLessEqual(total, 11)
+
+    def test_size_checked_on_interval(self):
+        """Размер проверяется первой записью и потом раз в интервал."""
+        cache = self.open_cache(MAX_ENTRIES=5, CULL_INTERVAL=3600)
+        for i in range(20):
+            cache.set(f'page:{i}', i)
+        keys = [f'page:{i}' for i in range(20)]
+        self.assertEqual(len(cache.get_many(keys)), 20)
+        cache._next_cull = 0.0
+        cache.set('page:20', 20)
+        self.assertEqual(len(cache.get_many(keys + ['page:20'])), 14)
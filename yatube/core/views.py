@@ -1,4 +1,13 @@
+import base64
+import binascii
+
+from django.contrib.auth import authenticate
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.views.decorators.cache import never_cache
+
+from .metrics import CONTENT_TYPE, REGISTRY
 
 
 def page_not_found(request, exception):
@@ -15,3 +24,35 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def basic_auth_user(request):
+    """Пользователь из заголовка Authorization: Basic или None."""
+    scheme, _, credentials = request.META.get(
+        'HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'basic':
+        return None
+    try:
+        username, _, password = base64.b64decode(
+            credentials).decode().partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    return authenticate(request, username=username, password=password)
+
+
+@never_cache
+def metrics(request):
+    """Метрики в формате Prometheus; только для персонала.
+
+    Сборщик входит по HTTP Basic, человек — своей сессией.
+    """
+    user = request.user
+    if not user.is_staff:
+        user = basic_auth_user(request) or user
+    if not user.is_authenticated:
+        response = HttpResponse(status=401)
+        response['WWW-Authenticate'] = 'Basic realm="metrics"'
+        return response
+    if not user.is_staff:
+        raise PermissionDenied
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
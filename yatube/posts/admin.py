@@ -1,22 +1,53 @@
 from django.contrib import admin
+from django.core.cache import cache
+
+from core.generations import get_generation
 
 from .models import Post, Group, Comment, Follow
+from .paginators import EstimatedCountPaginator
+from .search import filter_matching, match_expression
+
+
+class BigTableAdmin(admin.ModelAdmin):
+    """Список для больших таблиц: без точного COUNT(*) на каждой странице."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(BigTableAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'group':
+            # Без этого <select> групп в list_editable делает запрос
+            # на каждую строку списка.
+            key = f'admin:group_choices:{get_generation("groups")}'
+            field.choices = cache.get_or_set(key, lambda: list(field.choices))
+        return field
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по text идёт через индекс FTS5, а не LIKE '%...%'.
+        expression = match_expression(search_term)
+        if not expression:
+            return queryset, False
+        return filter_matching(queryset, expression), False
+
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(BigTableAdmin):
     list_display = ('pk', 'author', 'text', 'created', 'post')
+    list_select_related = ('author', 'post')
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(BigTableAdmin):
     list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
 
 
 admin.site.register(Post, PostAdmin)
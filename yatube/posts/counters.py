@@ -0,0 +1,112 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post, StoredImage, User, UserStats
+
+
+def bump(queryset, **deltas) -> None:
+    """Атомарно сдвигает счётчики: UPDATE ... SET field = field + delta.
+
+    Счётчик не уходит ниже нуля: расхождения чинит команда recount.
+    """
+    for field, delta in deltas.items():
+        if delta < 0:
+            queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def retain_image(name: str) -> None:
+    """Добавляет посту ссылку на файл картинки."""
+    if not name:
+        return
+    rows = StoredImage.objects.filter(name=name)
+    if rows.update(references=F('references') + 1, released_at=None):
+        return
+    try:
+        with transaction.atomic():
+            StoredImage.objects.create(name=name, references=1)
+    except IntegrityError:
+        # Строку только что создал параллельный запрос.
+        rows.update(references=F('references') + 1, released_at=None)
+
+
+def release_image(name: str) -> None:
+    """Снимает ссылку; файл без ссылок удалит команда collect_images."""
+    if name:
+        StoredImage.objects.filter(name=name, references__gte=1).update(
+            references=F('references') - 1, released_at=timezone.now())
+
+
+def _counts(queryset, key: str, ids) -> dict:
+    return dict(
+        queryset.filter(**{f'{key}__in': ids}).order_by()
+        .values(key).annotate(total=Count('pk'))
+        .values_list(key, 'total')
+    )
+
+
+def recount_users(user_ids) -> int:
+    """Пересчитывает UserStats пачки пользователей, возвращает число правок."""
+    user_ids = list(user_ids)
+    posts = _counts(Post.objects, 'author_id', user_ids)
+    followers = _counts(Follow.objects, 'author_id', user_ids)
+    following = _counts(Follow.objects, 'user_id', user_ids)
+    stats = UserStats.objects.in_bulk(user_ids)
+    missing = [
+        UserStats(user_id=user_id) for user_id in user_ids
+        if user_id not in stats
+    ]
+    for row in UserStats.objects.bulk_create(missing):
+        stats[row.user_id] = row
+    drifted = []
+    for user_id, row in stats.items():
+        actual = (posts.get(user_id, 0), followers.get(user_id, 0),
+                  following.get(user_id, 0))
+        stored = (row.posts_count, row.followers_count, row.following_count)
+        if actual != stored:
+            (row.posts_count, row.followers_count,
+             row.following_count) = actual
+            drifted.append(row)
+    UserStats.objects.bulk_update(
+        drifted, ['posts_count', 'followers_count', 'following_count'])
+    return len(drifted) + len(missing)
+
+
+def _recount(model, field: str, counts: dict, ids) -> int:
+    drifted = []
+    for obj in model.objects.filter(pk__in=ids).only('pk', field):
+        actual = counts.get(obj.pk, 0)
+        if getattr(obj, field) != actual:
+            setattr(obj, field, actual)
+            drifted.append(obj)
+    model.objects.bulk_update(drifted, [field])
+    return len(drifted)
+
+
+def recount_posts(post_ids) -> int:
+    post_ids = list(post_ids)
+    comments = _counts(Comment.objects, 'post_id', post_ids)
+    return _recount(Post, 'comments_count', comments, post_ids)
+
+
+def recount_groups(group_ids) -> int:
+    group_ids = list(group_ids)
+    posts = _counts(Post.objects, 'group_id', group_ids)
+    return _recount(Group, 'posts_count', posts, group_ids)
+
+
+def recount_images(names) -> int:
+    names = list(names)
+    posts = _counts(Post.objects, 'image', names)
+    return _recount(StoredImage, 'references', posts, names)
+
+
+RECOUNTERS = {
+    'users': (User, recount_users),
+    'posts': (Post, recount_posts),
+    'groups': (Group, recount_groups),
+    'images': (StoredImage, recount_images),
+}
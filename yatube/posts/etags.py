@@ -0,0 +1,59 @@
+"""Валидаторы условного GET для лент и страницы поста.
+
+Каждая функция собирает теги страницы и отдаёт её ETag, не выполняя
+основного запроса: если клиент прислал тот же If-None-Match, condition
+сразу отвечает 304. Для несуществующего объекта возвращается None, и
+представление само отдаёт 404. Ленты со ссылками на группы разных
+постов зависят и от поколения groups: смена slug или названия любой
+группы меняет их ETag.
+"""
+from core.pagecache import page_etag
+
+from .models import Group, Post, User
+
+
+def index_etag(request):
+    return page_etag(request, 'posts', 'groups')
+
+
+def group_etag(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        return None
+    return page_etag(request, f'group:{group_id}')
+
+
+def profile_etag(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return None
+    namespaces = [
+        f'author:{author_id}', f'author_posts:{author_id}', 'groups']
+    if request.user.is_authenticated:
+        namespaces.append(f'follow:{request.user.pk}')
+    return page_etag(request, *namespaces)
+
+
+def post_etag(request, post_id):
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id').first()
+    if row is None:
+        return None
+    author_id, group_id = row
+    # На странице поста — число постов автора.
+    namespaces = [
+        f'post:{post_id}', f'author:{author_id}', f'author_posts:{author_id}']
+    if group_id:
+        namespaces.append(f'group:{group_id}')
+    return page_etag(request, *namespaces)
+
+
+def comments_etag(request, post_id):
+    return page_etag(request, f'post:{post_id}')
+
+
+def follow_etag(request):
+    return page_etag(
+        request, 'posts', 'groups', f'follow:{request.user.pk}')
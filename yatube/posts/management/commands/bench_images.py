@@ -0,0 +1,124 @@
+import io
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.benchmarks import scratch_database
+from posts.models import Post, User
+
+VIEWPORTS = (360, 768, 1440)
+PICTURE = re.compile(r'<picture>(.*?)</picture>', re.S)
+CANDIDATES = re.compile(r'<(source|img)[^>]*?srcset="([^"]+)" sizes="([^"]+)"')
+
+
+def slot_width(sizes: str, viewport: int) -> float:
+    """Ширина слота из атрибута sizes, как её выберет браузер."""
+    for entry in sizes.split(','):
+        entry = entry.strip()
+        match = re.match(r'\(min-width:\s*(\d+)px\)\s*(.+)', entry)
+        if match:
+            if viewport < int(match[1]):
+                continue
+            entry = match[2]
+        if entry.endswith('vw'):
+            return viewport * float(entry[:-2]) / 100
+        return float(entry.rstrip('px'))
+    return viewport
+
+
+def pick(srcset: str, width: float) -> str:
+    """Самый узкий кандидат не уже нужной ширины, иначе самый широкий."""
+    candidates = sorted(
+        (int(descriptor[:-1]), url) for url, descriptor in
+        (candidate.split() for candidate in srcset.split(', '))
+    )
+    for candidate_width, url in candidates:
+        if candidate_width >= width:
+            return url
+    return candidates[-1][1]
+
+
+def file_size(url: str) -> int:
+    return default_storage.size(url[len(settings.MEDIA_URL):])
+
+
+def source_image(width: int, height: int) -> Image.Image:
+    """Синтетическое «фото»: фрактал, градиент и шум по каналам."""
+    return Image.merge('RGB', (
+        Image.effect_mandelbrot(
+            (width, height), (-2.2, -1.2, 1.0, 1.2), 64),
+        Image.linear_gradient('L').resize((width, height)),
+        Image.effect_noise((width, height), 8),
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает байты картинок на странице ленты: один JPEG 960x339 '
+        'против srcset в JPEG и WebP (во временной БД)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--viewports', type=int, nargs='+', default=VIEWPORTS)
+        parser.add_argument('--dpr', type=float, nargs='+', default=(1, 2))
+        parser.add_argument('--source-width', type=int, default=1920)
+        parser.add_argument('--source-height', type=int, default=1080)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root,
+                                  ALLOWED_HOSTS=['testserver']), \
+                scratch_database():
+            cache.clear()
+            self.fill(options['source_width'], options['source_height'])
+            html = Client().get(reverse('posts:index')).content.decode()
+            pictures = [
+                {tag: (srcset, sizes) for tag, srcset, sizes in
+                 CANDIDATES.findall(picture)}
+                for picture in PICTURE.findall(html)
+            ]
+            self.stdout.write(
+                f'{len(pictures)} картинок на странице, байты на страницу')
+            self.stdout.write(
+                f'{"viewport":>9} {"dpr":>4} {"960 jpeg":>10} '
+                f'{"srcset jpeg":>12} {"srcset webp":>12} {"экономия":>9}'
+            )
+            for viewport in options['viewports']:
+                for dpr in options['dpr']:
+                    self.run_case(pictures, viewport, dpr)
+            cache.clear()
+
+    def fill(self, width: int, height: int):
+        author = User.objects.create_user(username='bench_images')
+        for i in range(settings.POST_QUANTITY):
+            buffer = io.BytesIO()
+            source_image(width, height).save(buffer, 'JPEG', quality=90)
+            # Варианты создаются сразу: scratch-БД в памяти.
+            Post.objects.create(
+                author=author, text=f'Фото {i}',
+                image=ContentFile(buffer.getvalue(), name=f'bench_{i}.jpg'),
+            )
+
+    def run_case(self, pictures: list, viewport: int, dpr: float):
+        single = jpeg = webp = 0
+        for picture in pictures:
+            jpeg_srcset, sizes = picture['img']
+            webp_srcset, _ = picture['source']
+            width = slot_width(sizes, viewport) * dpr
+            single += file_size(pick(jpeg_srcset, float('inf')))
+            jpeg += file_size(pick(jpeg_srcset, width))
+            webp += file_size(pick(webp_srcset, width))
+        self.stdout.write(
+            f'{viewport:>9} {dpr:>4g} {single / 1024:>8.1f}KB '
+            f'{jpeg / 1024:>10.1f}KB {webp / 1024:>10.1f}KB '
+            f'{1 - webp / single:>9.0%}'
+        )
@@ -0,0 +1,64 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import measure, scratch_database
+from posts.models import Post, User
+from posts.search import SearchResults
+
+WORDS = (
+    'питон', 'джанго', 'кеш', 'индекс', 'лента', 'подписка', 'группа',
+    'комментарий', 'картинка', 'запрос', 'страница', 'сервер', 'база',
+    'поиск', 'автор', 'новость', 'погода', 'кофе', 'кот', 'собака',
+)
+RARE = 'фтс'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск через FTS5 с icontains на большой таблице '
+        'постов (во временной БД)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.fill(options['posts'], options['batch_size'])
+            self.stdout.write(
+                f'{"query":>10} {"backend":>10} {"p50":>10} {"p95":>10}')
+            for term in (WORDS[0], RARE, WORDS[0][:3]):
+                self.run_case(term, options['repeat'])
+
+    def fill(self, total: int, batch_size: int):
+        author = User.objects.create_user(username='bench_search')
+        rng = random.Random(0)
+        for start in range(0, total, batch_size):
+            batch = []
+            for i in range(start, min(total, start + batch_size)):
+                words = rng.choices(WORDS, k=12)
+                if i % 1000 == 0:
+                    words.append(RARE)
+                batch.append(Post(author=author, text=' '.join(words)))
+            Post.objects.bulk_create(batch)
+
+    def run_case(self, term: str, repeat: int):
+        def icontains():
+            posts = Post.objects.filter(text__icontains=term)
+            posts.count()
+            list(posts.select_related('author', 'group')[:10])
+
+        def fts():
+            results = SearchResults(term)
+            results.count()
+            results[0:10]
+
+        for name, func in (('icontains', icontains), ('fts5', fts)):
+            timings = measure(func, repeat)
+            self.stdout.write(
+                f'{term:>10} {name:>10} '
+                f'{timings["p50"]:>8.2f}ms {timings["p95"]:>8.2f}ms'
+            )
@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from core.benchmarks import measure, scratch_database
+from posts import timeline
+from posts.counters import recount_users
+from posts.models import Follow, Post, User
+
+FOLLOWER_COUNTS = (10, 1000, 100000)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает задержку записи и чтения ленты подписок '
+        'в режимах push и hybrid (во временной БД)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--followers', type=int, nargs='+', default=FOLLOWER_COUNTS)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.stdout.write(
+                f'{"followers":>10} {"mode":>7} '
+                f'{"write p50":>10} {"write p95":>10} '
+                f'{"read p50":>10} {"read p95":>10}'
+            )
+            for count in options['followers']:
+                self.run_case(count, options['repeat'])
+
+    def run_case(self, count: int, repeat: int):
+        author = User.objects.create_user(username=f'star_{count}')
+        User.objects.bulk_create(
+            User(username=f'fan_{count}_{i}') for i in range(count))
+        fans = User.objects.filter(username__startswith=f'fan_{count}_')
+        Follow.objects.bulk_create(
+            (Follow(user_id=pk, author=author)
+             for pk in fans.values_list('pk', flat=True).iterator()),
+            batch_size=timeline.BATCH_SIZE,
+        )
+        recount_users([author.pk])
+        reader = fans.first()
+        for mode, threshold in (('push', count), ('hybrid', count - 1)):
+            with override_settings(TIMELINE_PULL_THRESHOLD=threshold):
+                cache.delete(timeline.PULLED_AUTHORS_KEY)
+                write = measure(
+                    lambda: Post.objects.create(author=author, text='Пост'),
+                    repeat,
+                )
+                read = measure(
+                    lambda: list(timeline.feed_page(reader, None, None)),
+                    repeat,
+                )
+            self.stdout.write(
+                f'{count:>10} {mode:>7} '
+                f'{write["p50"]:>8.2f}ms {write["p95"]:>8.2f}ms '
+                f'{read["p50"]:>8.2f}ms {read["p95"]:>8.2f}ms'
+            )
@@ -0,0 +1,181 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.benchmarks import measure
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+# p99 из нескольких десятков замеров — шум: пишется, но не сравнивается.
+LATENCIES = ('p50', 'p95')
+# Бенчмарк чистит кеш перед каждой страницей: свой locmem, чтобы не
+# стереть общий кеш сайта, к которому подключён manage.py.
+BENCH_CACHES = {
+    'default': {**settings.CACHE_PRESETS['locmem'], 'LOCATION': 'bench_views'},
+}
+
+
+def cases(reader) -> dict:
+    """Адреса страниц для замера: самые тяжёлые в текущем наборе."""
+    urls = {'index': reverse('posts:index')}
+    group = Group.objects.order_by('-posts_count', 'pk').first()
+    if group is not None:
+        urls['group_list'] = reverse('posts:group_list', args=(group.slug,))
+    stats = UserStats.objects.select_related('user')
+    author = stats.order_by('-posts_count', 'pk').first()
+    if author is not None:
+        urls['profile'] = reverse(
+            'posts:profile', args=(author.user.username,))
+    post = Post.objects.order_by('-comments_count', 'pk').first()
+    if post is not None:
+        urls['post_detail'] = reverse('posts:post_detail', args=(post.pk,))
+    if reader is not None:
+        urls['follow_index'] = reverse('posts:follow_index')
+    return urls
+
+
+def compare(baseline: dict, current: dict, tolerance: float,
+            min_delta: float) -> list:
+    """Регрессии относительно базовой линии: (страница, метрика, было, стало).
+
+    Число запросов не должно расти вовсе, размер ответа — больше чем на
+    tolerance. Задержка считается выросшей, если прибавила и tolerance,
+    и не меньше min_delta миллисекунд.
+    """
+    regressions = []
+    for name, metrics in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        limits = {
+            'queries': before['queries'],
+            'bytes': before['bytes'] * (1 + tolerance),
+        }
+        for metric in LATENCIES:
+            limits[metric] = max(before[metric] * (1 + tolerance),
+                                 before[metric] + min_delta)
+        for metric, limit in limits.items():
+            if metrics[metric] > limit:
+                regressions.append(
+                    (name, metric, before[metric], metrics[metric]))
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Меряет страницы ленты, группы, профиля, поста и подписок на '
+        'текущей базе (см. seed_benchmark) и сравнивает с базовой линией'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Гостем: страницы отдаёт кеш (follow_index не меряется)')
+        parser.add_argument(
+            '--baseline', default='benchmark-baseline.json',
+            help='JSON с результатами прошлого замера')
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Записать результаты в --baseline вместо сравнения')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост задержек и размера ответа (доля)')
+        parser.add_argument(
+            '--min-delta', type=float, default=1.0,
+            help='Рост задержки меньше стольких мс регрессией не считается')
+
+    def handle(self, *args, **options):
+        reader = None
+        if not options['anonymous']:
+            stats = UserStats.objects.select_related('user').filter(
+                following_count__gt=0)
+            top = stats.order_by('-following_count', 'pk').first()
+            reader = top and top.user
+        client = Client()
+        if reader is not None:
+            client.force_login(reader)
+        urls = cases(reader)
+        with override_settings(ALLOWED_HOSTS=['testserver'],
+                               CACHES=BENCH_CACHES):
+            results = {
+                name: self.run_case(client, url, options)
+                for name, url in urls.items()
+            }
+        self.stdout.write(
+            f'{"view":>14} {"p50":>9} {"p95":>9} {"p99":>9} '
+            f'{"cold q":>7} {"queries":>7} {"bytes":>8}')
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:>14} {metrics["p50"]:>7.2f}ms '
+                f'{metrics["p95"]:>7.2f}ms {metrics["p99"]:>7.2f}ms '
+                f'{metrics["cold_queries"]:>7} {metrics["queries"]:>7} '
+                f'{metrics["bytes"]:>8}'
+            )
+        report = {
+            'dataset': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+            'anonymous': options['anonymous'],
+            'views': results,
+        }
+        path = options['baseline']
+        if options['save']:
+            with open(path, 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2, sort_keys=True)
+            self.stdout.write(f'Базовая линия записана в {path}')
+            return
+        if not os.path.exists(path):
+            self.stdout.write(
+                f'Базовой линии {path} нет: запустите с --save')
+            return
+        with open(path, encoding='utf-8') as source:
+            baseline = json.load(source)
+        if baseline['dataset'] != report['dataset'] \
+                or baseline['anonymous'] != report['anonymous']:
+            raise CommandError(
+                'Базовая линия снята на другом наборе данных или режиме')
+        regressions = compare(
+            baseline['views'], results, options['tolerance'],
+            options['min_delta'])
+        for name, metric, before, after in regressions:
+            self.stdout.write(self.style.ERROR(
+                f'{name}: {metric} {before:g} -> {after:g}'))
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def run_case(self, client: Client, url: str, options: dict) -> dict:
+        # Запросы считаются сразу: следующий запрос к странице очищает
+        # журнал соединения (reset_queries).
+        cache.clear()
+        with CaptureQueriesContext(connection) as cold:
+            response = client.get(url)
+        cold_queries = len(cold)
+        if response.status_code != 200:
+            raise CommandError(f'{url}: ответ {response.status_code}')
+        for _ in range(options['warmup']):
+            client.get(url)
+        with CaptureQueriesContext(connection) as warm:
+            response = client.get(url)
+        queries = len(warm)
+        timings = measure(lambda: client.get(url), options['repeat'])
+        return {
+            'url': url,
+            'p50': round(timings['p50'], 3),
+            'p95': round(timings['p95'], 3),
+            'p99': round(timings['p99'], 3),
+            'cold_queries': cold_queries,
+            'queries': queries,
+            'bytes': len(response.content),
+        }
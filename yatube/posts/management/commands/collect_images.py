@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from sorl.thumbnail import delete
+
+from posts.models import Post, StoredImage
+from posts.thumbnails import source
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые больше не ссылается ни один пост, '
+        'вместе с их миниатюрами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Сколько часов файл без ссылок ещё хранится: за это время '
+                 'его может подхватить повторная загрузка',
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        names = (
+            StoredImage.objects.filter(references=0)
+            .filter(Q(released_at__lt=cutoff) | Q(released_at__isnull=True))
+            .values_list('name', flat=True)
+        )
+        collected = 0
+        for name in list(names.iterator()):
+            if options['dry_run']:
+                self.stdout.write(name)
+                collected += 1
+            elif self.collect(name):
+                collected += 1
+        self.stdout.write(f'Удалено картинок: {collected}')
+
+    def collect(self, name: str) -> bool:
+        with transaction.atomic():
+            # Строку держим под блокировкой до удаления файла: retain_image
+            # параллельной загрузки той же картинки ждёт фиксации и
+            # не поднимет счётчик файла, который вот-вот исчезнет.
+            stored = (
+                StoredImage.objects.select_for_update()
+                .filter(name=name).first()
+            )
+            # Строку могли снова занять, пока шёл обход.
+            if stored is None or stored.references:
+                return False
+            # Счётчик мог разойтись с постами: такое чинит recount images.
+            if Post.objects.filter(image=name).exists():
+                return False
+            stored.delete()
+            delete(source(name))
+        return True
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из таблицы Follow'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи, чьи ленты пересобрать (по умолчанию все)',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        else:
+            users = users.filter(
+                pk__in=Follow.objects.values('user_id'))
+        total = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            total += timeline.rebuild(user_id)
+        self.stdout.write(f'Записей в лентах: {total}')
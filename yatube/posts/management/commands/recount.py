@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts.counters import RECOUNTERS
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает хранимые счётчики постов, комментариев и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'targets', nargs='*',
+            help=f'Что пересчитать: {", ".join(sorted(RECOUNTERS))} '
+                 '(по умолчанию всё)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        unknown = set(options['targets']) - set(RECOUNTERS)
+        if unknown:
+            raise CommandError(f'Неизвестные счётчики: {", ".join(unknown)}')
+        for target in options['targets'] or sorted(RECOUNTERS):
+            model, recount = RECOUNTERS[target]
+            ids = model.objects.order_by('pk').values_list('pk', flat=True)
+            fixed = 0
+            batch = []
+            for pk in ids.iterator():
+                batch.append(pk)
+                if len(batch) == batch_size:
+                    with transaction.atomic():
+                        fixed += recount(batch)
+                    batch = []
+            if batch:
+                with transaction.atomic():
+                    fixed += recount(batch)
+            self.stdout.write(f'{target}: исправлено {fixed}')
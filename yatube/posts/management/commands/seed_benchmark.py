@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу детерминированным синтетическим набором данных '
+        'для бенчмарков'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя')
+        parser.add_argument(
+            '--images', type=int, default=50,
+            help='Разных картинок; ими проиллюстрирован каждый 10-й пост')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь')
+        started = time.monotonic()
+        seeder = Seeder(options['seed'], report=self.stdout.write)
+        try:
+            created = seeder.run(
+                users=options['users'],
+                groups=options['groups'],
+                posts=options['posts'],
+                comments=options['comments'],
+                follows=options['follows'],
+                images=options['images'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        summary = ', '.join(f'{table} {count}'
+                            for table, count in created.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с: {summary}'))
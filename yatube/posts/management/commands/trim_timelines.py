@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        'Подрезает ленты подписок до TIMELINE_MAX_LENGTH записей; '
+        'запускается по расписанию'
+    )
+
+    def handle(self, *args, **options):
+        user_ids = list(timeline.overgrown())
+        timeline.trim(user_ids)
+        self.stdout.write(f'Подрезано лент: {len(user_ids)}')
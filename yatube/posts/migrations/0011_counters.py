@@ -0,0 +1,68 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def _counts(queryset, key):
+    return dict(
+        queryset.order_by().values(key).annotate(total=models.Count('pk'))
+        .values_list(key, 'total')
+    )
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Group = apps.get_model('posts', 'Group')
+    UserStats = apps.get_model('posts', 'UserStats')
+    posts = _counts(Post.objects, 'author_id')
+    followers = _counts(Follow.objects, 'author_id')
+    following = _counts(Follow.objects, 'user_id')
+    UserStats.objects.bulk_create(
+        (UserStats(
+            user_id=pk,
+            posts_count=posts.get(pk, 0),
+            followers_count=followers.get(pk, 0),
+            following_count=following.get(pk, 0),
+        ) for pk in User.objects.values_list('pk', flat=True).iterator()),
+        batch_size=500,
+    )
+    for post_id, total in _counts(Comment.objects, 'post_id').items():
+        Post.objects.filter(pk=post_id).update(comments_count=total)
+    for group_id, total in _counts(Post.objects, 'group_id').items():
+        Group.objects.filter(pk=group_id).update(posts_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0010_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(db_index=True, default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Внешний content-индекс: текст хранится только в posts_post, триггеры
+# держат индекс в актуальном состоянии и при bulk_create/update().
+CREATE = [
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_post_fts_ai AFTER INSERT ON posts_post "
+    "BEGIN INSERT INTO posts_post_fts (rowid, text) "
+    "VALUES (new.id, new.text); END",
+    "CREATE TRIGGER posts_post_fts_ad AFTER DELETE ON posts_post "
+    "BEGIN INSERT INTO posts_post_fts (posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER posts_post_fts_au AFTER UPDATE OF text ON posts_post "
+    "BEGIN INSERT INTO posts_post_fts (posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text); END",
+    "INSERT INTO posts_post_fts (posts_post_fts) VALUES ('rebuild')",
+]
+DROP = [
+    'DROP TRIGGER IF EXISTS posts_post_fts_ai',
+    'DROP TRIGGER IF EXISTS posts_post_fts_ad',
+    'DROP TRIGGER IF EXISTS posts_post_fts_au',
+    'DROP TABLE IF EXISTS posts_post_fts',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE, reverse_sql=DROP),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:27
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_stored_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='follow',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -8,6 +10,7 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
@@ -16,6 +19,7 @@ class Group(models.Model):
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -33,16 +37,44 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ('-pub_date',)
+        # Индексы по возрастанию: SQLite дописывает к ним rowid и
+        # читает их задом наперёд для ORDER BY pub_date DESC, id DESC.
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'], name='post_author_date_idx'),
+            models.Index(
+                fields=['group', 'pub_date'], name='post_group_date_idx'),
+        ]
 
     def __str__(self):
         return self.text
 
 
+class StoredImage(models.Model):
+    """Файл картинки в хранилище и число постов, которые на него ссылаются."""
+    name = models.CharField(max_length=100, primary_key=True)
+    references = models.PositiveIntegerField(default=0)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['references', 'released_at'],
+                name='stored_image_unused_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
 class Comment(models.Model):
     post = models.ForeignKey(
         Post,
@@ -55,6 +87,13 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        ordering = ('created',)
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -70,10 +109,56 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор',
     )
+    created = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'],
                 name='unique_following')
         ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0, db_index=True)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_post_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_post')
+        ]
@@ -0,0 +1,192 @@
+import base64
+import binascii
+import hashlib
+import heapq
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Max, Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction: str, position: tuple) -> str:
+    pub_date, pk = position
+    payload = json.dumps([direction, pub_date.isoformat(), pk])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """Разбирает токен курсора. Для битого токена возвращает None."""
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        payload = base64.urlsafe_b64decode((cursor + padding).encode())
+        direction, pub_date, pk = json.loads(payload.decode())
+        pub_date = parse_datetime(pub_date)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    if not isinstance(pk, int):
+        return None
+    return direction, (pub_date, pk)
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (pub_date, pk) без COUNT(*) и OFFSET.
+
+    Страница отдаётся обычным объектом Page, а ссылки на соседние
+    страницы хранятся в самом пагинаторе: next_cursor и previous_cursor.
+    Если задан related, на страницу попадают связанные объекты строк
+    (например, посты записей ленты).
+    """
+    is_cursor = True
+
+    def __init__(self, object_list: QuerySet, per_page: int,
+                 cursor: str = None, date_field: str = 'pub_date',
+                 pk_field: str = 'pk', related: str = None):
+        super().__init__(object_list, per_page)
+        self.date_field = date_field
+        self.pk_field = pk_field
+        self.related = related
+        self.cursor = cursor or ''
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def _position(self, obj) -> tuple:
+        return getattr(obj, self.date_field), getattr(obj, self.pk_field)
+
+    def fetch(self, direction: str, position: tuple, limit: int) -> list:
+        """Возвращает до limit пар (позиция, объект) в порядке обхода."""
+        date_field, pk_field = self.date_field, self.pk_field
+        ordering = (f'-{date_field}', f'-{pk_field}')
+        if direction == PREVIOUS:
+            ordering = (date_field, pk_field)
+        rows = self.object_list.order_by(*ordering)
+        if position is not None:
+            pub_date, pk = position
+            lookup = 'lt' if direction == NEXT else 'gt'
+            rows = rows.filter(
+                Q(**{f'{date_field}__{lookup}': pub_date})
+                | Q(**{date_field: pub_date, f'{pk_field}__{lookup}': pk})
+            )
+        return [
+            (self._position(row),
+             getattr(row, self.related) if self.related else row)
+            for row in rows[:limit]
+        ]
+
+    def page(self, number=None) -> Page:
+        decoded = decode_cursor(self.cursor) if self.cursor else None
+        direction, position = decoded or (NEXT, None)
+        rows = self.fetch(direction, position, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+        if rows:
+            more_after = has_more if direction == NEXT else True
+            more_before = has_more if direction == PREVIOUS else (
+                decoded is not None)
+            if more_after:
+                self.next_cursor = encode_cursor(NEXT, rows[-1][0])
+            if more_before:
+                self.previous_cursor = encode_cursor(PREVIOUS, rows[0][0])
+        return Page([obj for _, obj in rows], 1, self)
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Курсорная пагинация по k-way слиянию нескольких источников.
+
+    Источники — CursorPaginator'ы с общим ключом (дата, pk). Каждый
+    отдаёт не больше limit строк, слияние идёт в памяти через heapq,
+    дубликаты с одинаковой позицией отбрасываются.
+    """
+
+    def __init__(self, sources: list, per_page: int, cursor: str = None):
+        super().__init__(sources, per_page, cursor)
+
+    def fetch(self, direction: str, position: tuple, limit: int) -> list:
+        streams = [
+            source.fetch(direction, position, limit)
+            for source in self.object_list
+        ]
+        merged = heapq.merge(
+            *streams, key=lambda row: row[0], reverse=direction == NEXT)
+        rows, last = [], None
+        for row in merged:
+            if row[0] == last:
+                continue
+            rows.append(row)
+            last = row[0]
+            if len(rows) == limit:
+                break
+        return rows
+
+
+class WindowedPaginator(Paginator):
+    """Нумерованная пагинация без пересчёта COUNT(*) на каждом запросе.
+
+    Число объектов берётся из хранимого счётчика (count) или из кеша
+    на PAGINATOR_COUNT_TTL секунд, поэтому оно приблизительное: срез
+    страницы от него не зависит. В шаблон отдаётся только окно номеров
+    page_window вокруг текущей страницы.
+    """
+
+    def __init__(self, object_list: QuerySet, per_page: int,
+                 count: int = None):
+        super().__init__(object_list, per_page)
+        self._stored_count = count
+        self.page_window = range(1, 2)
+
+    @cached_property
+    def count(self):
+        if self._stored_count is not None:
+            return self._stored_count
+        sql = str(self.object_list.query).encode()
+        key = f'paginator:count:{hashlib.md5(sql).hexdigest()}'
+        return cache.get_or_set(
+            key, self.object_list.count, settings.PAGINATOR_COUNT_TTL)
+
+    def page(self, number) -> Page:
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = self.object_list[bottom:bottom + self.per_page]
+        radius = settings.PAGINATOR_WINDOW
+        self.page_window = range(
+            max(1, number - radius), min(self.num_pages, number + radius) + 1)
+        return self._get_page(object_list, number, self)
+
+
+class EstimatedCountPaginator(WindowedPaginator):
+    """Пагинатор админки без точного COUNT(*) по всей таблице.
+
+    Для таблицы без фильтров число строк оценивается по MAX(id) — это
+    один шаг по индексу; оценка завышена на число удалённых строк. Для
+    отфильтрованного списка берётся кешированный COUNT(*) из
+    WindowedPaginator.
+    """
+
+    def __init__(self, object_list: QuerySet, per_page: int, orphans=0,
+                 allow_empty_first_page=True):
+        super().__init__(object_list, per_page)
+
+    @cached_property
+    def count(self):
+        if self.object_list.query.where:
+            return super().count
+        return self.object_list.order_by().aggregate(
+            estimate=Max('pk'))['estimate'] or 0
@@ -0,0 +1,140 @@
+import re
+
+from django.db import connection
+from django.utils.functional import cached_property
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+SNIPPET_TOKENS = 16
+# Дальше ранжировать bm25 дороже, чем LIKE: отдаём сначала новые.
+RANK_LIMIT = 10000
+# Маркеры подсветки, которых не бывает в тексте: HTML экранируется после.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+TRIGGERS = (
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON posts_post '
+    f'BEGIN INSERT INTO {FTS_TABLE} (rowid, text) '
+    'VALUES (new.id, new.text); END',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON posts_post '
+    f'BEGIN INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text) '
+    "VALUES ('delete', old.id, old.text); END",
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au '
+    'AFTER UPDATE OF text ON posts_post '
+    f'BEGIN INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text) '
+    "VALUES ('delete', old.id, old.text); "
+    f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (new.id, new.text); END',
+)
+
+
+def install_triggers(cursor) -> None:
+    """Создаёт триггеры синхронизации индекса, если их нет.
+
+    SQLite-бэкенд Django пересоздаёт таблицу при изменении схемы, и
+    триггеры posts_post пропадают, поэтому они ставятся и после migrate.
+    """
+    for sql in TRIGGERS:
+        cursor.execute(sql)
+
+
+def drop_triggers(cursor) -> None:
+    """Снимает триггеры индекса: массовая загрузка пересобирает его потом."""
+    for name in ('ai', 'ad', 'au'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{name}')
+
+
+def rebuild_index(cursor) -> None:
+    cursor.execute(
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(query: str) -> str:
+    """Переводит строку поиска в запрос FTS5: все слова, каждое как префикс.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 из ввода не работают.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def filter_matching(queryset, expression: str):
+    """Оставляет в queryset постов только подходящие под выражение."""
+    # RawSQL в pk__in SQLite читает как скаляр: IN ((SELECT ...)).
+    return queryset.extra(
+        where=[
+            f'posts_post.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[expression],
+    )
+
+
+def highlight(snippet: str) -> str:
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class SearchResults:
+    """Результаты поиска для пагинатора.
+
+    Срез выполняет один запрос к индексу с LIMIT/OFFSET и догружает
+    посты с авторами и группами; у каждого поста есть snippet с
+    подсвеченными совпадениями. До RANK_LIMIT совпадений порядок по
+    релевантности (bm25), при большем числе — от новых к старым.
+    """
+
+    def __init__(self, query: str):
+        self.query = query
+        self.expression = match_expression(query)
+
+    @cached_property
+    def total(self) -> int:
+        if not self.expression:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                (self.expression,),
+            )
+            return cursor.fetchone()[0]
+
+    @property
+    def ranked(self) -> bool:
+        return self.total <= RANK_LIMIT
+
+    def count(self) -> int:
+        return self.total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index: slice) -> list:
+        if not self.expression:
+            return []
+        start = index.start or 0
+        ordering = 'rank' if self.ranked else 'rowid DESC'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY {ordering} LIMIT %s OFFSET %s',
+                (MARK_START, MARK_END, '…', SNIPPET_TOKENS,
+                 self.expression, index.stop - start, start),
+            )
+            rows = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in rows])
+        results = []
+        for pk, snippet in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
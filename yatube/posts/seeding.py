@@ -0,0 +1,270 @@
+"""Детерминированный синтетический набор данных для бенчмарков.
+
+Один и тот же seed даёт те же пользователи, группы, тексты, картинки и
+граф подписок. Популярность авторов, групп и постов распределена по
+закону Ципфа: немногие авторы пишут и собирают подписчиков больше всех,
+как на живом сайте. Строки вставляются bulk_create с явными pk, поэтому
+сигналы не срабатывают — счётчики, ссылки на картинки и ленты подписок
+пересчитываются в конце.
+"""
+import random
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import Mixer
+from PIL import Image, ImageDraw
+
+from . import timeline
+from .models import Comment, Follow, Group, Post, StoredImage, User
+from .utils import original_timestamps
+
+BATCH_SIZE = 2000
+# Последний пост набора: даты не зависят от дня запуска.
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+POST_INTERVAL = timedelta(minutes=7)
+USERNAME = 'seed_{}'
+
+
+def zipf_weights(count: int, exponent: float = 1.0) -> list:
+    """Накопленные веса рангов 1..count для random.choices."""
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, count + 1)))
+
+
+def next_pk(model) -> int:
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def batches(objects):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def picture(rng: random.Random, width: int = 960, height: int = 640):
+    """JPEG из случайных фигур: у каждой картинки своё содержимое."""
+    image = Image.new('RGB', (width, height), tuple(
+        rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(width), rng.randrange(height)
+        box = (x, y, x + rng.randrange(40, 400), y + rng.randrange(40, 300))
+        color = tuple(rng.randrange(256) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.ellipse(box, fill=color)
+        else:
+            draw.rectangle(box, fill=color)
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=85)
+    return ContentFile(output.getvalue())
+
+
+class Seeder:
+    def __init__(self, seed: int = 42, report=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.mixer = Mixer(commit=False)
+        self.mixer.faker.seed_instance(seed)
+        self.report = report or (lambda message: None)
+        self.user_ids = []
+        self.group_ids = []
+        self.posts = []
+
+    def run(self, users: int, groups: int, posts: int, comments: int,
+            follows: int, images: int) -> dict:
+        """Заполняет базу и возвращает число созданных строк по таблицам."""
+        if User.objects.filter(username=USERNAME.format(0)).exists():
+            raise ValueError('Набор уже загружен: очистите базу (flush)')
+        with original_timestamps(Post, Comment, Follow):
+            self.create_users(users)
+            self.create_groups(groups)
+            names = self.create_images(images)
+            self.create_posts(posts, names)
+            created_comments = self.create_comments(comments)
+            created_follows = self.create_follows(follows)
+        self.report('Пересчёт счётчиков и лент')
+        call_command('recount', stdout=_Silent())
+        cache.delete(timeline.PULLED_AUTHORS_KEY)
+        call_command('rebuild_timelines', stdout=_Silent())
+        cache.clear()
+        return {
+            'users': users,
+            'groups': groups,
+            'posts': posts,
+            'comments': created_comments,
+            'follows': created_follows,
+            'images': len(names),
+        }
+
+    def create_users(self, total: int) -> None:
+        start = next_pk(User)
+        password = make_password(None)
+        users = self.mixer.cycle(total).blend(
+            User,
+            id=(pk for pk in range(start, start + total)),
+            username=(USERNAME.format(i) for i in range(total)),
+            password=password,
+            is_staff=False,
+            is_superuser=False,
+            is_active=True,
+            last_login=None,
+        )
+        for batch in batches(users):
+            User.objects.bulk_create(batch)
+        self.user_ids = [user.pk for user in users]
+        # Ранг популярности не совпадает с порядком регистрации.
+        self.rng.shuffle(self.user_ids)
+        self.report(f'Пользователей: {total}')
+
+    def create_groups(self, total: int) -> None:
+        start = next_pk(Group)
+        groups = self.mixer.cycle(total).blend(
+            Group,
+            id=(pk for pk in range(start, start + total)),
+            slug=(f'seed-{self.seed}-{i}' for i in range(total)),
+            posts_count=0,
+        )
+        Group.objects.bulk_create(groups)
+        self.group_ids = [group.pk for group in groups]
+        self.report(f'Групп: {total}')
+
+    def create_images(self, total: int) -> list:
+        storage = Post._meta.get_field('image').storage
+        names = [
+            storage.save('posts/seed.jpg', picture(self.rng))
+            for _ in range(total)
+        ]
+        self.report(f'Картинок: {total}')
+        return names
+
+    def create_posts(self, total: int, images: list) -> None:
+        authors = zipf_weights(len(self.user_ids))
+        groups = zipf_weights(len(self.group_ids))
+        start = next_pk(Post)
+        first_date = EPOCH - POST_INTERVAL * total
+
+        def build():
+            for i in range(total):
+                pub_date = first_date + POST_INTERVAL * i
+                group_id = None
+                if self.group_ids and self.rng.random() < 2 / 3:
+                    group_id = self.rng.choices(
+                        self.group_ids, cum_weights=groups)[0]
+                image = ''
+                if images and self.rng.random() < 0.1:
+                    image = self.rng.choice(images)
+                post = Post(
+                    pk=start + i,
+                    author_id=self.rng.choices(
+                        self.user_ids, cum_weights=authors)[0],
+                    group_id=group_id,
+                    text=self.fake.text(max_nb_chars=400),
+                    image=image,
+                    pub_date=pub_date,
+                    updated_at=pub_date,
+                )
+                self.posts.append((post.pk, pub_date))
+                yield post
+
+        for batch in batches(build()):
+            with transaction.atomic():
+                Post.objects.bulk_create(batch)
+        StoredImage.objects.bulk_create(
+            (StoredImage(name=name) for name in set(images)),
+            ignore_conflicts=True,
+        )
+        self.report(f'Постов: {total}')
+
+    def create_comments(self, total: int) -> int:
+        if not self.posts:
+            return 0
+        # Чаще обсуждают свежие посты.
+        posts = self.posts[::-1]
+        weights = zipf_weights(len(posts), 0.8)
+        start = next_pk(Comment)
+
+        def build():
+            for i in range(total):
+                post_id, pub_date = self.rng.choices(
+                    posts, cum_weights=weights)[0]
+                yield Comment(
+                    pk=start + i,
+                    post_id=post_id,
+                    author_id=self.rng.choice(self.user_ids),
+                    text=self.fake.sentence(nb_words=12),
+                    created=pub_date + timedelta(
+                        minutes=self.rng.randrange(1, 60 * 24 * 7)),
+                )
+
+        for batch in batches(build()):
+            with transaction.atomic():
+                Comment.objects.bulk_create(batch)
+        self.report(f'Комментариев: {total}')
+        return total
+
+    def create_follows(self, mean: int) -> int:
+        """Подписки: у каждого в среднем mean, авторы — по Ципфу.
+
+        Число подписок пользователя тоже с тяжёлым хвостом (Парето),
+        поэтому есть и читатели с тысячами авторов в ленте.
+        """
+        if not mean or len(self.user_ids) < 2:
+            return 0
+        weights = zipf_weights(len(self.user_ids))
+        start, created = next_pk(Follow), 0
+        users = sorted(self.user_ids)
+
+        def build():
+            nonlocal created
+            for user_id in users:
+                wanted = min(
+                    len(users) - 1,
+                    int(self.rng.paretovariate(2) * mean / 2),
+                )
+                authors = set()
+                for _ in range(wanted * 3):
+                    if len(authors) == wanted:
+                        break
+                    author_id = self.rng.choices(
+                        self.user_ids, cum_weights=weights)[0]
+                    if author_id != user_id:
+                        authors.add(author_id)
+                for author_id in sorted(authors):
+                    yield Follow(
+                        pk=start + created,
+                        user_id=user_id,
+                        author_id=author_id,
+                        created=EPOCH,
+                    )
+                    created += 1
+
+        for batch in batches(build()):
+            with transaction.atomic():
+                Follow.objects.bulk_create(batch)
+        self.report(f'Подписок: {created}')
+        return created
+
+
+class _Silent:
+    # stdout для call_command: отчёты recount здесь не нужны.
+    def write(self, message: str) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
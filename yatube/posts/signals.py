@@ -0,0 +1,210 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db import connections, transaction
+from django.dispatch import receiver
+
+from core.generations import bump_on_commit
+
+from . import search, thumbnails, timeline
+from .counters import bump, release_image, retain_image
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_values(sender, instance, raw=False, **kwargs):
+    instance._old_group_id, instance._old_image = None, ''
+    if instance.pk and not raw:
+        instance._old_group_id, instance._old_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image').first() or (None, '')
+        )
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        bump(UserStats.objects.filter(user_id=instance.author_id),
+             posts_count=1)
+    elif instance._old_group_id == instance.group_id:
+        return
+    elif instance._old_group_id is not None:
+        bump(Group.objects.filter(pk=instance._old_group_id),
+             posts_count=-1)
+    if instance.group_id is not None:
+        bump(Group.objects.filter(pk=instance.group_id), posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    bump(UserStats.objects.filter(user_id=instance.author_id),
+         posts_count=-1)
+    if instance.group_id is not None:
+        bump(Group.objects.filter(pk=instance.group_id), posts_count=-1)
+
+
+def post_generations(post: Post) -> list:
+    """Поколения кеша лент, в которые попадает пост.
+
+    author:<id> здесь не сдвигается: от него зависят карточки всех постов
+    автора, а меняет его только имя автора. Профиль следит за постами
+    автора по author_posts:<id>.
+    """
+    namespaces = [
+        'posts', f'post:{post.pk}', f'author_posts:{post.author_id}']
+    group_ids = {post.group_id, getattr(post, '_old_group_id', None)}
+    namespaces.extend(
+        f'group:{group_id}' for group_id in group_ids if group_id)
+    return namespaces
+
+
+@receiver(post_save, sender=Post)
+def bump_post_generations(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_on_commit(*post_generations(instance))
+
+
+@receiver(post_delete, sender=Post)
+def bump_deleted_post_generations(sender, instance, **kwargs):
+    bump_on_commit(*post_generations(instance))
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnails(sender, instance, raw=False, **kwargs):
+    name = instance.image.name
+    if raw or not name or name == instance._old_image:
+        return
+    # Файл и строка должны быть видны пулу, поэтому после коммита.
+    transaction.on_commit(lambda: thumbnails.schedule(name))
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, raw=False, **kwargs):
+    if raw or instance.image.name == instance._old_image:
+        return
+    retain_image(instance.image.name)
+    release_image(instance._old_image)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_image_references(sender, instance, **kwargs):
+    release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_generations(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_on_commit(f'post:{instance.post_id}')
+
+
+# Поля, из которых собраны имя автора и ссылка на профиль в карточках.
+DISPLAY_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def remember_display_name(sender, instance, raw=False, update_fields=None,
+                          **kwargs):
+    instance._old_display_name = None
+    if raw or not instance.pk or (
+            update_fields is not None
+            and not set(update_fields) & set(DISPLAY_FIELDS)):
+        return
+    instance._old_display_name = User.objects.filter(
+        pk=instance.pk).values_list(*DISPLAY_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def bump_author_generations(sender, instance, raw=False, update_fields=None,
+                            **kwargs):
+    if raw or update_fields == frozenset(['last_login']):
+        return
+    namespaces = [f'author:{instance.pk}']
+    old = getattr(instance, '_old_display_name', None)
+    if old is not None and old != tuple(
+            getattr(instance, field) for field in DISPLAY_FIELDS):
+        # Имя автора есть в общей ленте и в лентах групп его постов,
+        # а имя комментатора — на страницах прокомментированных постов.
+        group_ids = list(Post.objects.filter(
+            author_id=instance.pk, group__isnull=False,
+        ).order_by().values_list('group_id', flat=True).distinct())
+        post_ids = list(Comment.objects.filter(
+            author_id=instance.pk,
+        ).order_by().values_list('post_id', flat=True).distinct())
+        namespaces.append('posts')
+        namespaces.extend(f'group:{group_id}' for group_id in group_ids)
+        namespaces.extend(f'post:{post_id}' for post_id in post_ids)
+    bump_on_commit(*namespaces)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_generations(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_on_commit(f'group:{instance.pk}', 'groups')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_generations(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_on_commit(f'follow:{instance.user_id}')
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump(Post.objects.filter(pk=instance.post_id), comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    bump(Post.objects.filter(pk=instance.post_id), comments_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def push_to_timelines(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.push_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump(UserStats.objects.filter(user_id=instance.author_id),
+             followers_count=1)
+        bump(UserStats.objects.filter(user_id=instance.user_id),
+             following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    bump(UserStats.objects.filter(user_id=instance.author_id),
+         followers_count=-1)
+    bump(UserStats.objects.filter(user_id=instance.user_id),
+         following_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.remove_author(instance.user_id, instance.author_id)
+
+
+def install_search_triggers(sender, using='default', **kwargs):
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        tables = connection.introspection.table_names(cursor)
+        if search.FTS_TABLE in tables:
+            search.install_triggers(cursor)
@@ -0,0 +1,59 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def file_digest(content) -> str:
+    """SHA-256 содержимого файла, читаемого кусками."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def digest_name(name: str, digest: str) -> str:
+    """posts/cat.JPG -> posts/ab/abcd….jpg: каталог и расширение те же."""
+    directory = os.path.dirname(name)
+    extension = os.path.splitext(name)[1].lower()
+    return os.path.join(directory, digest[:2], f'{digest}{extension}')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла задаёт его содержимое.
+
+    Загрузка хешируется кусками и кладётся под своим SHA-256, поэтому
+    повторная загрузка той же картинки не пишет второй файл, а посты с
+    одной картинкой делят и все её миниатюры: sorl строит их имена из
+    имени исходника. Кто ссылается на файл, учитывает StoredImage.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Имя выбирает _save по содержимому, суффиксы не нужны.
+        return name
+
+    def _save(self, name, content):
+        name = digest_name(name, file_digest(content))
+        if self.exists(name):
+            return name
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # Через временный файл и rename: одновременные загрузки одной
+        # картинки не увидят недописанный файл.
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(descriptor, 'wb') as temp:
+                for chunk in content.chunks():
+                    temp.write(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
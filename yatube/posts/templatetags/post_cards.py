@@ -0,0 +1,58 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.generations import get_generations
+
+from .. import thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/post.html'
+
+
+def card_namespaces(post) -> list:
+    """Поколения автора и группы: их имя и ссылки есть в карточке."""
+    namespaces = [f'author:{post.author_id}']
+    if post.group_id:
+        namespaces.append(f'group:{post.group_id}')
+    return namespaces
+
+
+def card_key(post, generations: dict) -> str:
+    versions = ':'.join(
+        str(generations[namespace]) for namespace in card_namespaces(post))
+    return f'post_card:{post.pk}:{post.updated_at.timestamp()}:{versions}'
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Отрендеренные карточки постов страницы.
+
+    Карточки берутся из кеша одним get_many по ключу (pk, updated_at,
+    поколения автора и группы), рендерятся только промахи. Правка поста
+    меняет updated_at, а правка автора или группы — их поколение, а
+    значит и ключ, так что старая карточка просто перестаёт читаться.
+    Поколения всей страницы читаются одним get_many. Варианты
+    картинок всех промахов находятся одной пачкой до рендера. Карточки,
+    ждущие миниатюру, не кешируются.
+    """
+    posts = list(posts)
+    generations = get_generations({
+        namespace for post in posts for namespace in card_namespaces(post)})
+    keys = [card_key(post, generations) for post in posts]
+    cards = cache.get_many(keys)
+    render = [
+        (key, post) for key, post in zip(keys, posts) if key not in cards]
+    thumbnails.resolve(post.image for _, post in render)
+    missing = {}
+    for key, post in render:
+        cards[key] = render_to_string(CARD_TEMPLATE, {'post': post})
+        # Карточку с оригиналом вместо миниатюры не кешируем.
+        if not getattr(post.image, 'thumbnail_pending', False):
+            missing[key] = cards[key]
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_TTL)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,49 @@
+from django import template
+from django.conf import settings
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+def srcset(variants) -> str:
+    return ', '.join(
+        f'{variant.url} {variant.width}w' for variant in variants)
+
+
+@register.inclusion_tag('posts/includes/responsive_image.html')
+def responsive_image(image, css_class='', sizes=None):
+    """Картинка поста в нескольких ширинах и форматах.
+
+    Готовые варианты выводятся как <picture>: по <source> на каждый
+    формат кроме последнего из POST_IMAGE_FORMATS, а последний — в
+    <img> с srcset, sizes, размерами и loading="lazy". Пока вариантов
+    нет, отдаётся оригинал (см. thumbnails.resolve). Ленты находят
+    варианты всей страницы заранее в post_cards, здесь — только для
+    картинки вне ленты, как на странице поста.
+    """
+    context = {
+        'image': image,
+        'css_class': css_class,
+        'sizes': sizes or settings.POST_IMAGE_SIZES,
+    }
+    if not hasattr(image, 'variants'):
+        thumbnails.resolve([image])
+    ready = image.variants
+    if ready is None:
+        return context
+    *formats, fallback = settings.POST_IMAGE_FORMATS
+    largest = ready[fallback][-1]
+    context.update({
+        'sources': [
+            {'type': f'image/{name.lower()}', 'srcset': srcset(ready[name])}
+            for name in formats
+        ],
+        'fallback': {
+            'url': largest.url,
+            'srcset': srcset(ready[fallback]),
+            'width': largest.width,
+            'height': largest.height,
+        },
+    })
+    return context
@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.testing import OnCommitMixin
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AdminChangelistTests(OnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        groups = Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'group-{i}', description='')
+            for i in range(20)
+        )
+        authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(5)
+        ]
+        Post.objects.bulk_create(
+            Post(author=authors[i % 5], group=groups[i % 20], text=f'№{i}')
+            for i in range(150)
+        )
+        post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=authors[i % 5], text=f'№{i}')
+            for i in range(150)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=author, author=cls.admin) for author in authors)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def changelist(self, name):
+        return reverse(f'admin:posts_{name}_changelist')
+
+    def test_changelist_queries_do_not_grow(self):
+        """ Число запросов страницы списка не зависит от числа строк """
+        # Сессия, пользователь, оценка числа строк и сама страница; у
+        # постов ещё два запроса навигации date_hierarchy.
+        expected = {'post': (8, 100), 'comment': (6, 100), 'follow': (6, 5)}
+        for name, (queries, rows) in expected.items():
+            with self.subTest(model=name):
+                self.client.get(self.changelist(name))
+                with self.assertNumQueries(queries):
+                    response = self.client.get(self.changelist(name))
+                self.assertEqual(
+                    len(response.context['cl'].result_list), rows)
+
+    def test_group_choices_are_cached(self):
+        """ Группы для list_editable читаются один раз до правки группы """
+        url = self.changelist('post')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        group_queries = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT "posts_group"')
+        ]
+        self.assertEqual(len(group_queries), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Group.objects.create(title='Новая', slug='new', description='')
+        self.assertContains(self.client.get(url), 'Новая')
+
+    def test_estimated_and_filtered_counts(self):
+        """ Без фильтров число строк — MAX(id), с поиском — точный COUNT """
+        Post.objects.filter(text='№0').delete()
+        response = self.client.get(self.changelist('post'))
+        self.assertEqual(response.context['cl'].result_count, 150)
+        response = self.client.get(self.changelist('post'), {'q': '№1'})
+        self.assertEqual(response.context['cl'].result_count, 61)
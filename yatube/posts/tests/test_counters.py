@@ -0,0 +1,85 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='first', description='Первая')
+        cls.other_group = Group.objects.create(
+            title='Другая', slug='second', description='Вторая')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        """ Посты считаются у автора и группы, в том числе при смене группы """
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(
+            (self.group.posts_count, self.other_group.posts_count), (0, 1))
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_comment_and_follow_counters(self):
+        """ Комментарии и подписки считаются, каскадное удаление тоже """
+        reader = User.objects.create_user(username='leaving')
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=reader, text='Ок')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Follow.objects.create(user=reader, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(reader).following_count, 1)
+        reader.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+
+    def test_profile_reads_stored_counter(self):
+        """ Профиль показывает хранимый счётчик постов """
+        Post.objects.create(author=self.author, text='Пост')
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        response = Client().get(
+            reverse('posts:profile', args=(self.author.username,)))
+        self.assertContains(response, 'Количество постов: 42')
+
+    def test_recount_repairs_drift(self):
+        """ Команда recount чинит разошедшиеся счётчики """
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        UserStats.objects.filter(user=self.author).delete()
+        Post.objects.update(comments_count=7)
+        Group.objects.update(posts_count=0)
+        call_command('recount', '--batch-size', '1', stdout=StringIO())
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 from http import HTTPStatus
@@ -81,7 +82,8 @@ class PostFormTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.group.id, form_data['group'])
         self.assertEqual(post.author, form_data['author'])
-        self.assertEqual(post.image, f'posts/{uploaded.name}')
+        digest = hashlib.sha256(small_gif).hexdigest()
+        self.assertEqual(post.image, f'posts/{digest[:2]}/{digest}.gif')
 
     def test_existing_post_editing(self):
         tostform_data = {
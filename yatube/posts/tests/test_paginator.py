@@ -1,9 +1,11 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from ..models import Post, Group
+from ..paginators import CursorPaginator, WindowedPaginator
 
 User = get_user_model()
 
@@ -40,6 +42,11 @@ class PaginatorViewsTest(TestCase):
     def tearDownClass(cls):
         super().tearDownClass()
 
+    def setUp(self):
+        # Поколения кеша сдвигаются после коммита, а в TestCase его нет:
+        # страницы прошлых тестов не должны отдаваться из кеша.
+        cache.clear()
+
     def test_paginator_on_pages(self):
         """ Проверка пагинации на страницах"""
         urls = [
@@ -60,3 +67,118 @@ class PaginatorViewsTest(TestCase):
                     reverse_ + f'?page={self.count_pages}').context.get(
                     'page_obj')),
                     self.rez)
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursor_user')
+        cls.posts_count = 25
+        cls.per_page = 10
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {i}')
+            for i in range(cls.posts_count)
+        )
+        # Половина постов с одинаковой датой: порядок решает pk.
+        same_date = Post.objects.order_by('pk').first().pub_date
+        Post.objects.filter(
+            pk__in=Post.objects.order_by('pk').values('pk')[:12]
+        ).update(pub_date=same_date)
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+
+    def get_page(self, cursor=None):
+        paginator = CursorPaginator(Post.objects.all(), self.per_page, cursor)
+        return paginator.page()
+
+    def test_cursor_walks_forward_and_back(self):
+        """ Курсор проходит выборку вперёд и назад без пропусков """
+        seen, cursor, pages = [], None, []
+        while True:
+            page = self.get_page(cursor)
+            pages.append([post.pk for post in page])
+            seen.extend(pages[-1])
+            if not page.paginator.has_next:
+                break
+            cursor = page.paginator.next_cursor
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+        page = self.get_page(page.paginator.previous_cursor)
+        self.assertEqual([post.pk for post in page], pages[1])
+        page = self.get_page(page.paginator.previous_cursor)
+        self.assertEqual([post.pk for post in page], pages[0])
+        self.assertFalse(page.paginator.has_previous)
+
+    def test_cursor_page_runs_single_query(self):
+        """ Страница курсора — один запрос, без COUNT(*) """
+        first = self.get_page()
+        with self.assertNumQueries(1):
+            page = self.get_page(first.paginator.next_cursor)
+            list(page)
+
+    def test_broken_cursor_returns_first_page(self):
+        """ Битый курсор отдаёт первую страницу """
+        page = self.get_page('не-курсор')
+        self.assertEqual(
+            [post.pk for post in page], self.expected[:self.per_page])
+
+    def test_cursor_links_on_index(self):
+        """ Главная отдаёт ссылки ?cursor= и принимает их """
+        response = self.client.get(reverse('posts:index'))
+        next_cursor = response.context['page_obj'].paginator.next_cursor
+        self.assertContains(response, f'?cursor={next_cursor}')
+        response = self.client.get(
+            reverse('posts:index') + f'?cursor={next_cursor}')
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            self.expected[self.per_page:self.per_page * 2])
+
+
+@override_settings(PAGINATOR_WINDOW=2)
+class WindowedPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='window_user')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {i}') for i in range(100)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_only_window_of_pages_is_rendered(self):
+        """ Номера страниц выводятся только окном вокруг текущей """
+        response = self.client.get(reverse('posts:index') + '?page=5')
+        paginator = response.context['page_obj'].paginator
+        self.assertEqual(list(paginator.page_window), [3, 4, 5, 6, 7])
+        for number in (2, 8, 9):
+            self.assertNotContains(response, f'?page={number}"')
+        for number in (1, 3, 7, 10):
+            self.assertContains(response, f'?page={number}"')
+
+    def test_count_is_cached(self):
+        """ COUNT(*) выполняется один раз на время жизни кеша """
+        posts = Post.objects.all()
+        WindowedPaginator(posts, 10).get_page(2)
+        with self.assertNumQueries(1):
+            list(WindowedPaginator(posts, 10).get_page(2))
+
+    def test_stored_count_is_used(self):
+        """ Хранимый счётчик заменяет COUNT(*), срез от него не зависит """
+        paginator = WindowedPaginator(Post.objects.all(), 10, count=15)
+        with self.assertNumQueries(1):
+            page = paginator.get_page(2)
+            self.assertEqual(len(page), 10)
+        self.assertEqual(paginator.num_pages, 2)
@@ -0,0 +1,95 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+( AS \w+)?$')
+PULLED_POSTS = '"posts_post"."author_id" IN (SELECT'
+
+
+@override_settings(TIMELINE_PULL_THRESHOLD=1)
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cache.clear()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.star = User.objects.create_user(username='star')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='test_slug',
+            description='О группе',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Follow.objects.create(user=cls.user, author=cls.star)
+        Follow.objects.create(user=cls.fan, author=cls.star)
+        cache.clear()
+        for author in (cls.author, cls.star):
+            Post.objects.bulk_create(
+                Post(author=author, group=cls.group, text=f'Пост {i}')
+                for i in range(15)
+            )
+        cls.post = Post.objects.filter(author=cls.author).first()
+        Comment.objects.create(post=cls.post, author=cls.user, text='Ок')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cache.clear()
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_plans_use_indexes(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        selects = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        self.assertTrue(selects)
+        for sql in selects:
+            for step in self.explain(sql):
+                with self.subTest(url=url, sql=sql, step=step):
+                    # Посты популярных авторов ленты читаются одним
+                    # запросом по индексу автора и сливаются сортировкой.
+                    if PULLED_POSTS not in sql:
+                        self.assertNotIn('TEMP B-TREE', step)
+                    self.assertIsNone(FULL_SCAN.match(step))
+
+    def test_feed_queries_use_indexes(self):
+        """ Запросы лент идут по индексам без сортировки, на всех страницах """
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            self.assert_plans_use_indexes(url)
+            response = self.authorized_client.get(url)
+            next_cursor = response.context['page_obj'].paginator.next_cursor
+            self.assert_plans_use_indexes(f'{url}?cursor={next_cursor}')
+
+    def test_post_detail_queries_use_indexes(self):
+        """ Запросы страницы поста идут по индексам без сортировки """
+        self.assert_plans_use_indexes(
+            reverse('posts:post_detail', args=(self.post.pk,)))
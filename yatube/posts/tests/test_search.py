@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import SearchResults, match_expression
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пишу про <b>питоны</b> и змей')
+        cls.other = Post.objects.create(
+            author=cls.user, text='Питон, питон и ещё раз питон')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+
+    def found(self, query):
+        results = SearchResults(query)
+        return [post.pk for post in results[0:results.count()]]
+
+    def test_match_expression_quotes_words(self):
+        """ Слова из ввода становятся префиксами, операторы не проходят """
+        self.assertEqual(
+            match_expression('пит OR "змей'), '"пит"* "OR"* "змей"*')
+        self.assertEqual(match_expression('!!!'), '')
+
+    def test_index_follows_writes(self):
+        """ Индекс видит вставку, правку, удаление и bulk_create """
+        post = Post.objects.create(author=self.user, text='Черепаха')
+        self.assertEqual(self.found('черепах'), [post.pk])
+        Post.objects.filter(pk=post.pk).update(text='Ящерица')
+        self.assertEqual(self.found('черепах'), [])
+        self.assertEqual(self.found('ящериц'), [post.pk])
+        post.delete()
+        self.assertEqual(self.found('ящериц'), [])
+        Post.objects.bulk_create([Post(author=self.user, text='Варан')])
+        self.assertEqual(len(self.found('варан')), 1)
+
+    def test_results_are_ranked_and_highlighted(self):
+        """ Частые совпадения выше, сниппет подсвечен и экранирован """
+        results = SearchResults('питон')[0:10]
+        self.assertEqual([post.pk for post in results],
+                         [self.other.pk, self.post.pk])
+        snippet = results[1].snippet
+        self.assertIn('<mark>питоны</mark>', snippet)
+        self.assertIn('&lt;b&gt;', snippet)
+
+    def test_search_page(self):
+        """ Страница поиска показывает найденное и хранит q в ссылках """
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Питон №{i}') for i in range(15))
+        response = self.client.get(reverse('posts:search'), {'q': 'питон'})
+        self.assertEqual(
+            len(response.context['page_obj']), settings.POST_QUANTITY)
+        self.assertContains(response, 'Найдено записей: 17')
+        self.assertContains(
+            response, '?q=%D0%BF%D0%B8%D1%82%D0%BE%D0%BD&amp;page=2')
+
+    def test_admin_search_uses_index(self):
+        """ Поиск в админке находит пост по префиксу слова """
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'зме'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post])
+
+    def test_common_words_are_ordered_by_date(self):
+        """ Сверх RANK_LIMIT совпадений выдача идёт от новых к старым """
+        newest = Post.objects.create(author=self.user, text='Питон')
+        with mock.patch('posts.search.RANK_LIMIT', 1):
+            results = SearchResults('питон')
+            self.assertFalse(results.ranked)
+            self.assertEqual(results[0:1], [newest])
@@ -0,0 +1,83 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from ..management.commands.bench_views import compare
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+from ..seeding import Seeder
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SIZES = dict(users=20, groups=3, posts=60, comments=100, follows=4, images=2)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class SeedBenchmarkTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def snapshot(self) -> list:
+        return list(Post.objects.order_by('pub_date').values_list(
+            'author__username', 'author__email', 'group__slug', 'text',
+            'image', 'pub_date'))
+
+    def test_same_seed_same_dataset(self):
+        """ Один seed — один и тот же набор данных """
+        Seeder(7).run(**SIZES)
+        first = self.snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        Seeder(7).run(**SIZES)
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(len(first), SIZES['posts'])
+
+    def test_counters_and_timelines_consistent(self):
+        """ Счётчики, подписки и ленты согласованы после заполнения """
+        created = Seeder().run(**SIZES)
+        self.assertEqual(Comment.objects.count(), created['comments'])
+        self.assertEqual(Follow.objects.count(), created['follows'])
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        counts = Post.objects.annotate(actual=Count('comments'))
+        for post in counts:
+            self.assertEqual(post.comments_count, post.actual)
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertLessEqual(
+            Post.objects.exclude(image='').values('image').distinct().count(),
+            SIZES['images'])
+
+    def test_bench_views_saves_baseline(self):
+        """ Бенчмарк пишет по каждой странице задержки, запросы и байты """
+        Seeder().run(**SIZES)
+        path = os.path.join(TEMP_MEDIA_ROOT, 'baseline.json')
+        cache.set('bench_views:shared', 'чужое')
+        call_command('bench_views', repeat=2, warmup=1, baseline=path,
+                     save=True, stdout=StringIO())
+        # Замер чистит только свой кеш.
+        self.assertEqual(cache.get('bench_views:shared'), 'чужое')
+        with open(path, encoding='utf-8') as source:
+            report = json.load(source)
+        self.assertEqual(report['dataset']['posts'], SIZES['posts'])
+        self.assertEqual(set(report['views']), {
+            'index', 'group_list', 'profile', 'post_detail', 'follow_index'})
+        for metrics in report['views'].values():
+            self.assertGreater(metrics['queries'], 0)
+            self.assertGreater(metrics['bytes'], 0)
+
+    def test_compare_flags_regressions(self):
+        """ Лишний запрос и заметный рост задержки — регрессии """
+        before = {'index': {'p50': 10, 'p95': 20, 'queries': 4,
+                            'bytes': 1000}}
+        after = {'index': {'p50': 10.5, 'p95': 30, 'queries': 5,
+                           'bytes': 1100}}
+        self.assertEqual(
+            compare(before, after, tolerance=0.2, min_delta=1),
+            [('index', 'queries', 4, 5), ('index', 'p95', 20, 30)])
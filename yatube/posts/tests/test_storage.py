@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import thumbnails
+from ..counters import retain_image
+from ..management.commands.collect_images import Command
+from ..models import Post, StoredImage
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded(name):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reposter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_same_picture_is_stored_once(self):
+        """ Повторная загрузка той же картинки не создаёт второй файл """
+        first = Post.objects.create(
+            author=self.user, text='Мем', image=uploaded('meme.gif'))
+        second = Post.objects.create(
+            author=self.user, text='Репост', image=uploaded('repost.GIF'))
+        self.assertEqual(first.image.name, second.image.name)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory), [
+            os.path.basename(first.image.name)])
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).references, 2)
+
+    def test_unreferenced_image_is_collected(self):
+        """ collect_images удаляет только файлы без ссылок и их миниатюры """
+        first = Post.objects.create(
+            author=self.user, text='Мем', image=uploaded('meme.gif'))
+        second = Post.objects.create(
+            author=self.user, text='Репост', image=uploaded('meme.gif'))
+        path = first.image.path
+        thumbnails.generate(first.image.name)
+        thumbnails.resolve([second.image])
+        self.assertIsNotNone(second.image.variants)
+        first.delete()
+        call_command('collect_images', grace_hours=0, stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
+        second.image = None
+        second.save()
+        self.assertEqual(
+            StoredImage.objects.get(name=first.image.name).references, 0)
+        call_command('collect_images', grace_hours=0, stdout=StringIO())
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredImage.objects.exists())
+        thumbnails.resolve([first.image])
+        self.assertIsNone(first.image.variants)
+
+    def test_image_retained_after_listing_is_kept(self):
+        """ Картинку, которую снова загрузили после обхода, collect_images
+        не удаляет: счётчик перепроверяется под блокировкой строки """
+        post = Post.objects.create(
+            author=self.user, text='Мем', image=uploaded('meme.gif'))
+        name, path = post.image.name, post.image.path
+        post.delete()
+        # Повторная загрузка: файл уже есть, _save его не пишет.
+        retain_image(name)
+        self.assertFalse(Command(stdout=StringIO()).collect(name))
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(StoredImage.objects.get(name=name).references, 1)
@@ -0,0 +1,129 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_new_image_is_scheduled_after_commit(self):
+        """ Сохранение с новой картинкой ставит миниатюры в пул """
+        with mock.patch('posts.signals.transaction.on_commit',
+                        side_effect=lambda func: func()), \
+                mock.patch('posts.thumbnails.schedule') as schedule:
+            post = Post.objects.create(
+                author=self.user, text='Фото', image=uploaded())
+            post.text = 'Подпись'
+            post.save()
+        schedule.assert_called_once_with(post.image.name)
+
+    def test_feed_serves_original_until_ready(self):
+        """ Пока миниатюры нет, лента отдаёт оригинал и не кеширует его """
+        post = Post.objects.create(
+            author=self.user, text='Фото', image=uploaded())
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.image.url)
+        schedule.assert_called_once_with(post.image.name)
+        thumbnails.generate(post.image.name)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, post.image.url)
+        self.assertContains(response, f'{settings.MEDIA_URL}cache/')
+
+    def test_ready_variants_render_srcset(self):
+        """ Готовые варианты выводятся в <picture> с srcset по форматам """
+        post = Post.objects.create(
+            author=self.user, text='Фото', image=uploaded())
+        thumbnails.generate(post.image.name)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,)))
+        self.assertContains(response, '<source type="image/webp"')
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertContains(response, f'.webp {width}w')
+            self.assertContains(response, f'.jpg {width}w')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_page_variants_resolved_in_constant_queries(self):
+        """ Варианты всех картинок страницы находятся одним запросом """
+        for shade in range(3):
+            buffer = BytesIO()
+            Image.new('RGB', (4, 4), (shade, 0, 0)).save(buffer, 'PNG')
+            post = Post.objects.create(
+                author=self.user, text='Фото', image=SimpleUploadedFile(
+                    'shade.png', buffer.getvalue(), 'image/png'))
+            thumbnails.generate(post.image.name)
+        cache.clear()
+        images = [post.image for post in Post.objects.all()]
+        with self.assertNumQueries(1):
+            thumbnails.resolve(images)
+        self.assertTrue(all(image.variants for image in images))
+        with self.assertNumQueries(0):
+            thumbnails.resolve(images)
+
+    def test_schedule_is_deduplicated(self):
+        """ Одна картинка не попадает в очередь дважды """
+        with override_settings(POST_THUMBNAIL_WORKERS=1), \
+                mock.patch('posts.thumbnails.connection') as connection, \
+                mock.patch('posts.thumbnails.executor') as executor:
+            connection.is_in_memory_db.return_value = False
+            thumbnails.schedule('posts/same.gif')
+            thumbnails.schedule('posts/same.gif')
+        executor.return_value.submit.assert_called_once_with(
+            thumbnails.generate, 'posts/same.gif')
+        thumbnails._pending.clear()
+
+    def test_failed_source_is_scheduled_once(self):
+        """ Картинка без файла не ставится в очередь на каждой странице """
+        post = Post.objects.create(
+            author=self.user, text='Фото', image='posts/missing.gif')
+        with self.assertLogs('posts.thumbnails', 'ERROR') as logs, \
+                mock.patch('posts.thumbnails.generate',
+                           wraps=thumbnails.generate) as generate:
+            for _ in range(3):
+                post.image.variants = None
+                thumbnails.resolve([post.image])
+        generate.assert_called_once_with(post.image.name)
+        self.assertEqual(len(logs.output), 1)
+        self.assertTrue(post.image.thumbnail_pending)
@@ -0,0 +1,129 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def timeline(self, user):
+        return list(
+            TimelineEntry.objects.filter(user=user).values_list(
+                'post_id', flat=True)
+        )
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        """ Подписка заполняет ленту, отписка очищает """
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,)))
+        self.assertEqual(self.timeline(self.reader), [self.old_post.pk])
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,)))
+        self.assertEqual(self.timeline(self.reader), [])
+
+    def test_new_post_is_pushed_to_followers(self):
+        """ Новый пост попадает в ленты подписчиков """
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            self.timeline(self.reader), [post.pk, self.old_post.pk])
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [
+            post, self.old_post])
+
+    @override_settings(TIMELINE_MAX_LENGTH=3)
+    def test_timeline_is_trimmed(self):
+        """ trim_timelines подрезает ленты до TIMELINE_MAX_LENGTH, а чтение
+        ленты ничего не удаляет """
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(4)
+        ]
+        everything = [post.pk for post in reversed(posts)]
+        everything.append(self.old_post.pk)
+        with CaptureQueriesContext(connection) as context:
+            self.reader_client.get(reverse('posts:follow_index'))
+        self.assertFalse([
+            query for query in context.captured_queries
+            if query['sql'].startswith('DELETE')
+        ])
+        self.assertEqual(self.timeline(self.reader), everything)
+        call_command('trim_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline(self.reader), everything[:3])
+
+    def test_rebuild_timelines_command(self):
+        """ Команда rebuild_timelines восстанавливает ленты """
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline(self.reader), [self.old_post.pk])
+
+
+@override_settings(TIMELINE_PULL_THRESHOLD=1)
+class HybridTimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cache.clear()
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.star)
+        Follow.objects.create(user=cls.fan, author=cls.star)
+        cache.clear()
+        cls.posts = [
+            Post.objects.create(
+                author=cls.star if i % 3 else cls.author, text=f'Пост {i}')
+            for i in range(12)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cache.clear()
+
+    def test_popular_author_is_not_pushed(self):
+        """ Посты популярного автора не раскладываются по лентам """
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__author=self.star).exists())
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        """ Лента сливает записи ленты и посты популярных авторов """
+        expected = list(reversed(self.posts))
+        page = timeline.feed_page(self.reader, None, None, 5)
+        seen = list(page)
+        while page.paginator.has_next:
+            page = timeline.feed_page(
+                self.reader, None, page.paginator.next_cursor, 5)
+            seen.extend(page)
+        self.assertEqual(seen, expected)
+        page = timeline.feed_page(
+            self.reader, None, page.paginator.previous_cursor, 5)
+        self.assertEqual(list(page), expected[5:10])
@@ -1,15 +1,26 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.views.decorators.http import condition
 
-from ..models import Post, Group
+from core.generations import bump_generation, get_generations
+from core.pagecache import add_cache_tags, cache_anonymous_page, page_etag
+from core.testing import OnCommitMixin
+
+from ..models import Comment, Follow, Post, Group
+from ..templatetags.post_cards import card_key, card_namespaces, post_cards
 
 User = get_user_model()
 
 
-class PostsPagesTests(TestCase):
+class PostsPagesTests(OnCommitMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -140,14 +151,402 @@ class PostsPagesTests(TestCase):
     def test_cache_index_page(self):
         """Тестирование использование кеширования"""
         cache.clear()
-        post = Post.objects.get(pk=self.post.id)
+        post = Post.objects.create(author=self.user, text='Кешируемый пост')
         content_on_page = self.client.get(
             reverse('posts:index')).content
-        post.delete()
-        content_on_page_delete = self.client.get(
+        Post.objects.filter(pk=post.pk).update(text='Правка мимо сигналов')
+        content_on_page_update = self.client.get(
             reverse('posts:index')).content
-        self.assertEqual(content_on_page, content_on_page_delete)
+        self.assertEqual(content_on_page, content_on_page_update)
         cache.clear()
         cache_clear = self.client.get(
             reverse('posts:index')).content
         self.assertNotEqual(content_on_page, cache_clear)
+
+    def test_cache_index_page_invalidated_on_write(self):
+        """Сохранение и удаление поста сразу сбрасывают кеш ленты"""
+        cache.clear()
+        post = Post.objects.create(author=self.user, text='Кешируемый пост')
+        content_on_page = self.client.get(
+            reverse('posts:index')).content
+        with self.captureOnCommitCallbacks(execute=True):
+            post.text = 'Отредактированный пост'
+            post.save()
+        self.assertContains(
+            self.client.get(reverse('posts:index')),
+            'Отредактированный пост')
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        content_on_page_delete = self.client.get(
+            reverse('posts:index')).content
+        self.assertNotEqual(content_on_page, content_on_page_delete)
+        self.assertNotContains(
+            self.client.get(reverse('posts:index')),
+            'Отредактированный пост')
+
+
+class PostCardCacheTests(OnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='card_user')
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'Карточка {i}')
+            for i in range(3)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cards_are_cached_by_updated_at(self):
+        """ Карточки берутся из кеша, правка поста меняет ключ """
+        post_cards(self.posts)
+        generations = get_generations(card_namespaces(self.posts[0]))
+        self.assertEqual(len(cache.get_many(
+            [card_key(post, generations) for post in self.posts])), 3)
+        post = self.posts[0]
+        Post.objects.filter(pk=post.pk).update(text='Мимо сигналов')
+        post.refresh_from_db()
+        self.assertIn('Карточка 0', post_cards([post])[0])
+        post.text = 'Новая карточка'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertIn('Новая карточка', post_cards([post])[0])
+
+    def test_author_and_group_changes_rerender_cards(self):
+        """ Новое имя автора и slug группы видны в карточке сразу """
+        group = Group.objects.create(
+            title='Группа карточек', slug='old_slug', description='')
+        Post.objects.filter(pk=self.posts[0].pk).update(group=group)
+        post = Post.objects.get(pk=self.posts[0].pk)
+        self.assertIn('/group/old_slug/', post_cards([post])[0])
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Переименован'
+        group.slug = 'new_slug'
+        with self.captureOnCommitCallbacks(execute=True):
+            author.save()
+            group.save()
+        post.refresh_from_db()
+        card = post_cards([post])[0]
+        self.assertIn('Переименован', card)
+        self.assertIn('/group/new_slug/', card)
+        self.assertNotIn('old_slug', card)
+
+    def test_new_post_keeps_author_cards(self):
+        """ Новый пост автора не сбрасывает карточки его старых постов """
+        post_cards(self.posts)
+        generations = get_generations(card_namespaces(self.posts[0]))
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(author=self.user, text='Свежая карточка')
+        self.assertEqual(
+            get_generations(card_namespaces(self.posts[0])), generations)
+        self.assertEqual(len(cache.get_many(
+            [card_key(post, generations) for post in self.posts])), 3)
+        response = self.client.get(
+            reverse('posts:profile', args=(self.user.username,)))
+        self.assertContains(response, 'Свежая карточка')
+
+    def test_feed_renders_cached_cards(self):
+        """ Лента подписок собирается из закешированных карточек """
+        follower = User.objects.create_user(username='card_follower')
+        Follow.objects.create(user=follower, author=self.user)
+        client = Client()
+        client.force_login(follower)
+        client.get(reverse('posts:follow_index'))
+        with self.assertTemplateNotUsed('posts/post.html'):
+            response = client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Карточка 2')
+
+
+class AnonymousPageCacheTests(OnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='page_user')
+        cls.other = User.objects.create_user(username='other_user')
+        cls.post = Post.objects.create(author=cls.user, text='Страница')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:post_detail', args=(self.post.pk,))
+
+    def get_without_selects(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        selects = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(selects, [])
+        return response
+
+    def test_anonymous_page_is_served_from_cache(self):
+        """ Повторный анонимный запрос не читает из базы """
+        self.client.get(self.url)
+        response = self.get_without_selects(self.url)
+        self.assertContains(response, 'Страница')
+
+    def test_only_affected_tags_are_purged(self):
+        """ Чужой пост не сбрасывает страницу, комментарий — сбрасывает """
+        self.client.get(self.url)
+        Post.objects.create(author=self.other, text='Чужой пост')
+        self.get_without_selects(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(
+                post=self.post, author=self.other,
+                text='Свежий комментарий')
+        self.assertContains(self.client.get(self.url), 'Свежий комментарий')
+
+    def test_write_during_render_is_not_cached_as_fresh(self):
+        """ Страница, при рендере которой сдвинулось поколение, не
+        отдаётся из кеша под новым поколением """
+        renders = []
+
+        @cache_anonymous_page
+        @condition(etag_func=lambda request: page_etag(request, 'posts'))
+        def view(request):
+            renders.append(request)
+            # Запись другого запроса коммитится во время рендера.
+            bump_generation('posts')
+            add_cache_tags(request, 'posts')
+            return HttpResponse(f'рендер {len(renders)}')
+
+        def get():
+            request = RequestFactory().get('/render-race/')
+            request.user = AnonymousUser()
+            return view(request)
+
+        get()
+        self.assertContains(get(), 'рендер 2')
+        self.assertEqual(len(renders), 2)
+
+    def test_authenticated_requests_bypass_cache(self):
+        """ Авторизованный пользователь получает свою страницу с формой """
+        self.client.get(self.url)
+        client = Client()
+        client.force_login(self.other)
+        self.assertContains(client.get(self.url), 'csrfmiddlewaretoken')
+
+
+class ConditionalGetTests(OnCommitMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='etag_user')
+        cls.author = User.objects.create_user(username='etag_author')
+        cls.post = Post.objects.create(author=cls.author, text='Валидатор')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def revalidate(self, client, url):
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_page_is_not_modified(self):
+        """ Совпавший ETag даёт 304, не загружая пост и комментарии """
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        client = self.authorized_client
+        # Первый ответ выставляет CSRF-cookie, а она входит в ETag.
+        client.get(url)
+        etag = client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        selects = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT') and 'posts_' in query['sql']
+        ]
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn('posts_comment', selects[0])
+
+    def test_cached_anonymous_page_is_not_modified(self):
+        """ Анонимная страница из кеша отвечает 304 без чтения из базы """
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any(
+            query['sql'].startswith('SELECT')
+            for query in context.captured_queries
+        ))
+
+    def test_write_changes_etag(self):
+        """ Новый комментарий меняет ETag страницы поста """
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(
+                post=self.post, author=self.user, text='Комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_post_changes_author_pages_etag(self):
+        """ Новый пост автора меняет ETag его профиля и страниц его постов:
+        на них число постов автора """
+        counts = {
+            reverse('posts:profile', args=(self.author.username,)):
+                'Количество постов: 2',
+            reverse('posts:post_detail', args=(self.post.pk,)):
+                'Всего постов автора: 2',
+        }
+        etags = {url: self.client.get(url)['ETag'] for url in counts}
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(author=self.author, text='Ещё валидатор')
+        for url, count in counts.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertContains(response, count)
+
+    def test_follow_feed_revalidation(self):
+        """ Подписка меняет ETag ленты, ETag зависит от пользователя """
+        url = reverse('posts:follow_index')
+        response = self.revalidate(self.authorized_client, url)
+        self.assertEqual(response.status_code, 304)
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.user, author=self.author)
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Валидатор')
+        other = Client()
+        other.force_login(self.author)
+        response = other.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_group_and_author_changes_change_etag(self):
+        """ Новый slug группы и новое имя автора меняют ETag лент """
+        group = Group.objects.create(
+            title='Группа', slug='etag_group', description='')
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        group_url = reverse('posts:group_list', args=(group.slug,))
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:follow_index'),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=self.user, author=self.author)
+        client = self.authorized_client
+        client.get(urls[0])
+        etags = {url: client.get(url)['ETag'] for url in urls}
+        etags[group_url] = client.get(group_url)['ETag']
+        group.slug = 'etag_group_new'
+        with self.captureOnCommitCallbacks(execute=True):
+            group.save()
+        for url in urls:
+            with self.subTest(url=url, change='group'):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, '/group/etag_group_new/')
+                etags[url] = response['ETag']
+        group_url = reverse('posts:group_list', args=(group.slug,))
+        etags[group_url] = client.get(group_url)['ETag']
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Переименован'
+        with self.captureOnCommitCallbacks(execute=True):
+            author.save()
+        for url in urls + (group_url,):
+            with self.subTest(url=url, change='author'):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Переименован')
+
+    def test_commenter_rename_changes_post_etag(self):
+        """ Новое имя комментатора меняет ETag страницы поста и сбрасывает
+        её анонимный кеш """
+        commenter = User.objects.create_user(username='etag_commenter')
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(
+                post=self.post, author=commenter, text='Комментарий')
+        urls = (
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            reverse('posts:post_comments', args=(self.post.pk,)),
+        )
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        commenter.username = 'renamed_commenter'
+        with self.captureOnCommitCallbacks(execute=True):
+            commenter.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertContains(response, 'renamed_commenter')
+                response = self.client.get(url)
+                self.assertContains(response, 'renamed_commenter')
+
+    def test_feeds_support_conditional_get(self):
+        """ Ленты и профиль отвечают 304 на повторный запрос """
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=1',
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.revalidate(self.authorized_client, url)
+                self.assertEqual(response.status_code, 304)
+
+
+class PostCommentsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commenter')
+        cls.quiet_post = Post.objects.create(author=cls.user, text='Тихий')
+        cls.popular_post = Post.objects.create(
+            author=cls.user, text='Популярный')
+        Comment.objects.bulk_create(
+            Comment(post=cls.popular_post, author=cls.user, text=f'№{i}')
+            for i in range(10000)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_queries_do_not_grow(self):
+        """ Число запросов страницы поста не зависит от комментариев """
+        for post in (self.quiet_post, self.popular_post):
+            with self.subTest(comments=post.comments.count()):
+                with self.assertNumQueries(5):
+                    self.client.get(
+                        reverse('posts:post_detail', args=(post.pk,)))
+
+    def test_post_detail_shows_latest_comments(self):
+        """ На странице поста только последние COMMENT_QUANTITY """
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.popular_post.pk,)))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENT_QUANTITY)
+        self.assertEqual(comments[0].text, '№9999')
+        self.assertContains(response, 'Ранние комментарии')
+
+    def test_comments_fragment_continues_by_cursor(self):
+        """ Фрагмент по курсору отдаёт следующие, более ранние комментарии """
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.popular_post.pk,)))
+        cursor = response.context['comments'].paginator.next_cursor
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.popular_post.pk,)),
+            {'cursor': cursor},
+        )
+        comments = response.context['comments']
+        self.assertEqual(comments[0].text, f'№{9999 - len(comments)}')
+        self.assertNotContains(response, '<html')
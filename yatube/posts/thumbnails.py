@@ -0,0 +1,235 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core.generations import bump_generation
+from core.instrumentation import timed
+from core.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+GENERATED = Counter(
+    'yatube_thumbnails_generated_total',
+    'Картинки, для которых созданы все варианты', ('result',))
+GENERATION_SECONDS = Histogram(
+    'yatube_thumbnail_generation_seconds',
+    'Время создания всех вариантов картинки, с',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+QUEUE = Gauge(
+    'yatube_thumbnail_queue', 'Картинки в очереди на создание вариантов')
+LOOKUPS = Counter(
+    'yatube_thumbnail_lookups_total',
+    'Картинки на страницах: варианты готовы или ещё создаются', ('result',))
+
+
+def failed_key(name: str) -> str:
+    return f'thumbnail:failed:{name}'
+
+
+def _normalize(source: ImageFile, options: dict) -> dict:
+    # Те же умолчания, что в ThumbnailBackend.get_thumbnail: от них
+    # зависит имя файла миниатюры.
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def _thumbnail_key(image, geometry: str, options: dict) -> str:
+    # Ключ записи миниатюры в key-value store: имя файла миниатюры
+    # выводится из исходника и опций, без обращения к хранилищу.
+    source = ImageFile(image)
+    options = _normalize(source, options)
+    name = default.backend._get_thumbnail_filename(source, geometry, options)
+    return add_prefix(ImageFile(name, default.storage).key)
+
+
+def _get_raw_many(keys: list) -> dict:
+    """Записи key-value store sorl одним get_many и одним запросом к БД.
+
+    Повторяет KVStore._get_raw из cached_db пачкой: промахи кеша
+    читаются из таблицы и кладутся в кеш, отсутствующие — как
+    EMPTY_VALUE, чтобы следующая страница не ходила за ними в БД.
+    """
+    kvstore, empty = default.kvstore, cached_db_kvstore.EMPTY_VALUE
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        found = {key: kvstore._get_raw(key) for key in keys}
+        return {key: value for key, value in found.items() if value}
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        rows = dict(
+            KVStoreModel.objects.filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        fetched = {key: rows.get(key, empty) for key in missing}
+        kvstore.cache.set_many(
+            fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(fetched)
+    return {key: value for key, value in found.items() if value != empty}
+
+
+def variants():
+    """Варианты картинки поста: (формат, геометрия, опции sorl).
+
+    Каждая ширина из POST_IMAGE_WIDTHS в каждом формате из
+    POST_IMAGE_FORMATS, обрезка по центру до POST_IMAGE_RATIO.
+    """
+    for image_format in settings.POST_IMAGE_FORMATS:
+        for width in settings.POST_IMAGE_WIDTHS:
+            height = round(width * settings.POST_IMAGE_RATIO)
+            yield image_format, f'{width}x{height}', {
+                'crop': 'center', 'upscale': True, 'format': image_format,
+            }
+
+
+@timed('thumbnail_time')
+def resolve(images) -> None:
+    """Находит готовые варианты всех картинок страницы разом.
+
+    Записи всех вариантов читаются одним multi-get (и одним запросом к
+    БД на промахи кеша), так что число обращений не зависит от числа
+    постов. Каждой картинке ставится атрибут variants: словарь форматов
+    со списками вариантов по ширине, с размерами из key-value store.
+    Если хоть одного варианта нет, variants = None, картинка получает
+    флаг thumbnail_pending, а генерация всех недостающих ставится в
+    пул и идёт параллельно, не задерживая ответ.
+    """
+    images = [image for image in images if image]
+    if not images:
+        return
+    keys = {
+        image.name: [
+            (image_format, _thumbnail_key(image, geometry, options))
+            for image_format, geometry, options in variants()
+        ]
+        for image in images
+    }
+    found = _get_raw_many(
+        [key for image_keys in keys.values() for _, key in image_keys])
+    for image in images:
+        ready = {}
+        for image_format, key in keys[image.name]:
+            if key not in found:
+                ready = None
+                break
+            ready.setdefault(image_format, []).append(
+                deserialize_image_file(found[key]))
+        LOOKUPS.inc(result='pending' if ready is None else 'ready')
+        if ready is None:
+            image.variants = None
+            image.thumbnail_pending = True
+            schedule(image.name)
+            continue
+        for thumbnails in ready.values():
+            thumbnails.sort(key=lambda thumbnail: thumbnail.width)
+        image.variants = ready
+
+
+def source(name: str):
+    """Файл картинки поста по имени — в хранилище поля Post.image.
+
+    sorl строит ключ миниатюр из имени и хранилища исходника, поэтому
+    генерация и поиск должны видеть один и тот же файл.
+    """
+    from .models import Post
+    field = Post._meta.get_field('image')
+    return field.attr_class(None, field, name)
+
+
+@timed('thumbnail_time')
+def generate(name: str) -> None:
+    """Создаёт все варианты картинки и сбрасывает кеш её постов."""
+    from .models import Post
+    from .signals import post_generations
+    try:
+        started = time.perf_counter()
+        image = source(name)
+        keys = []
+        for _, geometry, options in variants():
+            get_thumbnail(image, geometry, **options)
+            keys.append(_thumbnail_key(image, geometry, options))
+        # sorl не бросает исключение на пропавший или битый исходник,
+        # а только пишет в лог и не создаёт запись миниатюры.
+        if len(_get_raw_many(keys)) < len(keys):
+            raise ValueError(f'Исходник {name} не читается')
+        GENERATION_SECONDS.observe(time.perf_counter() - started)
+        GENERATED.inc(result='ok')
+        namespaces = set()
+        posts = Post.objects.filter(image=name).only(
+            'pk', 'author_id', 'group_id')
+        for post in posts.iterator():
+            namespaces.update(post_generations(post))
+        if namespaces:
+            bump_generation(*namespaces)
+    except Exception:
+        GENERATED.inc(result='error')
+        # Без отметки каждая страница с этой картинкой ставила бы её
+        # в пул снова и писала бы в лог ту же ошибку.
+        cache.set(failed_key(name), True,
+                  settings.POST_THUMBNAIL_RETRY_AFTER)
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+            QUEUE.set(len(_pending))
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POST_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def schedule(name: str) -> None:
+    """Ставит генерацию миниатюр в пул; повторная постановка игнорируется.
+
+    Картинка, генерация которой упала, снова ставится не раньше чем
+    через POST_THUMBNAIL_RETRY_AFTER секунд.
+
+    При POST_THUMBNAIL_WORKERS = 0 миниатюры создаются сразу. Так же и
+    с in-memory SQLite (тестовая БД): её таблицы блокируются целиком, и
+    фоновые потоки мешали бы очистке базы между тестами.
+    """
+    if cache.get(failed_key(name)):
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        QUEUE.set(len(_pending))
+    in_memory = getattr(connection, 'is_in_memory_db', lambda: False)()
+    if not settings.POST_THUMBNAIL_WORKERS or in_memory:
+        generate(name)
+        return
+    executor().submit(generate, name)
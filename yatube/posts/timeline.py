@@ -0,0 +1,157 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.db import transaction
+from django.db.models import Count, QuerySet
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginators import CursorPaginator, MergedCursorPaginator
+from .utils import posts_on_page
+
+BATCH_SIZE = 500
+PULLED_AUTHORS_KEY = 'timeline:pulled_authors'
+PULLED_AUTHORS_TTL = 300
+
+
+def pulled_authors() -> frozenset:
+    """Авторы, чьи посты не раскладываются по лентам, а читаются на лету.
+
+    Это авторы с числом подписчиков больше TIMELINE_PULL_THRESHOLD.
+    Множество кешируется, чтобы запись и чтение ленты видели одно и то
+    же решение. Автор, опустившийся ниже порога, вернётся в ленты
+    целиком после rebuild_timelines.
+    """
+    authors = cache.get(PULLED_AUTHORS_KEY)
+    if authors is None:
+        authors = frozenset(
+            UserStats.objects.filter(
+                followers_count__gt=settings.TIMELINE_PULL_THRESHOLD
+            ).values_list('user_id', flat=True)
+        )
+        cache.set(PULLED_AUTHORS_KEY, authors, PULLED_AUTHORS_TTL)
+    return authors
+
+
+def trim(user_ids) -> None:
+    """Оставляет в лентах только TIMELINE_MAX_LENGTH свежих записей.
+
+    При раскладке поста ленты не обрезаются, чтобы запись не стоила
+    лишнего запроса на каждого подписчика, а чтение ленты ничего не
+    удаляет: лента подрезается при подписке, при пересборке и командой
+    trim_timelines, которую запускают по расписанию.
+    """
+    limit = settings.TIMELINE_MAX_LENGTH
+    for user_id in user_ids:
+        edge = (
+            TimelineEntry.objects.filter(user_id=user_id)
+            .values_list('pub_date', 'post_id')[limit:limit + 1]
+        )
+        if not edge:
+            continue
+        pub_date, post_id = edge[0]
+        stale = TimelineEntry.objects.filter(user_id=user_id).filter(
+            pub_date__lte=pub_date
+        ).exclude(pub_date=pub_date, post_id__gt=post_id)
+        stale.delete()
+
+
+def overgrown() -> QuerySet:
+    """id читателей, чьи ленты длиннее TIMELINE_MAX_LENGTH."""
+    return (
+        TimelineEntry.objects.order_by().values('user_id')
+        .annotate(length=Count('pk'))
+        .filter(length__gt=settings.TIMELINE_MAX_LENGTH)
+        .values_list('user_id', flat=True)
+    )
+
+
+def push_post(post: Post) -> None:
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if post.author_id in pulled_authors():
+        return
+    follower_ids = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+    )
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in follower_ids),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id: int, author_id: int) -> None:
+    """Добавляет в ленту свежие посты автора после подписки."""
+    if author_id in pulled_authors():
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-pk')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_MAX_LENGTH]
+    )
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def remove_author(user_id: int, author_id: int) -> None:
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+@transaction.atomic
+def rebuild(user_id: int) -> int:
+    """Собирает ленту читателя заново из его подписок."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    posts = (
+        Post.objects.filter(author__following__user_id=user_id)
+        .exclude(author_id__in=pulled_authors())
+        .order_by('-pub_date', '-pk')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_MAX_LENGTH]
+    )
+    entries = TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts),
+        batch_size=BATCH_SIZE,
+    )
+    return len(entries)
+
+
+def feed_page(user, page_number, cursor: str,
+              on_screen_posts: int = settings.POST_QUANTITY) -> Page:
+    """Страница ленты подписок: записи ленты + посты популярных авторов.
+
+    Для старых ссылок ?page=N лента собирается обычным запросом
+    через Follow.
+    """
+    if page_number is not None:
+        posts = Post.objects.filter(
+            author__following__user=user
+        ).select_related('author', 'group')
+        return posts_on_page(page_number, posts, on_screen_posts)
+    sources = [CursorPaginator(
+        user.timeline.select_related('post__author', 'post__group'),
+        on_screen_posts, pk_field='post_id', related='post',
+    )]
+    pulled = pulled_authors()
+    if pulled:
+        # Все популярные авторы из подписок — одним источником и одним
+        # запросом с тем же ключом (pub_date, pk), что у ленты. Строки
+        # авторов сливает сортировка с LIMIT, зато число запросов не
+        # растёт с числом подписок.
+        followed = Follow.objects.filter(
+            user=user, author_id__in=pulled).values('author_id')
+        sources.append(CursorPaginator(
+            Post.objects.filter(author_id__in=followed)
+            .select_related('author', 'group'),
+            on_screen_posts,
+        ))
+    paginator = MergedCursorPaginator(sources, on_screen_posts, cursor)
+    return paginator.page()
@@ -1,11 +1,61 @@
+from contextlib import contextmanager
+
 from django.conf import settings
-from django.core.paginator import Paginator, Page
+from django.core.paginator import Page
 from django.db.models import QuerySet
 
+from .models import Comment
+from .paginators import CursorPaginator, WindowedPaginator
+
 
 def posts_on_page(page_number: int,
                   post_list: QuerySet,
-                  on_screen_posts: int = settings.POST_QUANTITY) -> Page:
-    paginator = Paginator(post_list, on_screen_posts)
-    page_posts = paginator.get_page(page_number)
-    return page_posts
+                  on_screen_posts: int = settings.POST_QUANTITY,
+                  cursor: str = None,
+                  count: int = None) -> Page:
+    if page_number is not None:
+        paginator = WindowedPaginator(post_list, on_screen_posts, count)
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(post_list, on_screen_posts, cursor)
+    return paginator.page()
+
+
+def comments_on_page(post_id: int,
+                     cursor: str = None,
+                     on_screen_comments: int = settings.COMMENT_QUANTITY
+                     ) -> Page:
+    """Комментарии поста от новых к ранним, с авторами одним запросом."""
+    comments = Comment.objects.filter(post_id=post_id).select_related('author')
+    paginator = CursorPaginator(
+        comments, on_screen_comments, cursor, date_field='created')
+    return paginator.page()
+
+
+def post_cache_tags(posts) -> set:
+    """Теги кеша страниц для постов, авторов и групп на странице."""
+    tags = set()
+    for post in posts:
+        tags.update((f'post:{post.pk}', f'author:{post.author_id}'))
+        if post.group_id:
+            tags.add(f'group:{post.group_id}')
+    return tags
+
+
+@contextmanager
+def original_timestamps(*models):
+    """Отключает auto_now и auto_now_add: даты задаёт вызывающий код."""
+    fields = [
+        field
+        for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
@@ -1,9 +1,19 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
 
+from core.pagecache import add_cache_tags, cache_anonymous_page
+
+from .etags import (comments_etag, follow_etag, group_etag, index_etag,
+                    post_etag, profile_etag)
 from .forms import PostForm, CommentForm
 from .models import Group, Post, User, Follow
-from .utils import posts_on_page
+from .paginators import WindowedPaginator
+from .search import SearchResults
+from .timeline import feed_page
+from .utils import comments_on_page, post_cache_tags, posts_on_page
 
 
 @login_required
@@ -40,7 +50,7 @@ def post_edit(request, post_id):
                     instance=post
                     )
 
-    if post.author != request.user:
+    if post.author_id != request.user.pk:
         return redirect('posts:post_detail', post_id=post_id)
 
     if request.method == 'POST':
@@ -53,22 +63,31 @@ def post_edit(request, post_id):
     })
 
 
+@cache_anonymous_page
+@condition(etag_func=index_etag)
 def index(request):
     posts = Post.objects.select_related('group', 'author')
     page_number = request.GET.get('page')
-    page_obj = posts_on_page(page_number, posts)
+    cursor = request.GET.get('cursor')
+    page_obj = posts_on_page(page_number, posts, cursor=cursor)
+    add_cache_tags(request, 'posts', *post_cache_tags(page_obj))
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_anonymous_page
+@condition(etag_func=group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related('author')
     page_number = request.GET.get('page')
+    cursor = request.GET.get('cursor')
 
-    page_obj = posts_on_page(page_number, posts)
+    page_obj = posts_on_page(
+        page_number, posts, cursor=cursor, count=group.posts_count)
+    add_cache_tags(request, f'group:{group.pk}', *post_cache_tags(page_obj))
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -76,15 +95,25 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_anonymous_page
+@condition(etag_func=profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
     posts = author.posts.select_related('group')
     page_number = request.GET.get('page')
+    cursor = request.GET.get('cursor')
     user = request.user
     following = False
     if request.user.is_authenticated:
         following = user.is_authenticated and author.following.exists()
-    page_obj = posts_on_page(page_number, posts)
+    stats = getattr(author, 'stats', None)
+    page_obj = posts_on_page(
+        page_number, posts, cursor=cursor,
+        count=stats and stats.posts_count)
+    add_cache_tags(
+        request, f'author:{author.pk}', f'author_posts:{author.pk}',
+        *post_cache_tags(page_obj))
     context = {
         'author': author,
         'page_obj': page_obj,
@@ -93,11 +122,16 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@cache_anonymous_page
+@condition(etag_func=post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
+    add_cache_tags(
+        request, f'author_posts:{post.author_id}', *post_cache_tags([post]))
     author = post.author
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments = comments_on_page(post.pk)
     context = {
         'author': author,
         'post': post,
@@ -107,11 +141,39 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+@cache_anonymous_page
+@condition(etag_func=comments_etag)
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = comments_on_page(post_id, request.GET.get('cursor'))
+    add_cache_tags(request, f'post:{post_id}')
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    results = SearchResults(query)
+    paginator = WindowedPaginator(
+        results, settings.POST_QUANTITY, results.count())
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'extra_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@condition(etag_func=follow_etag)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
     page_number = request.GET.get('page')
-    page_obj = posts_on_page(page_number, posts)
+    cursor = request.GET.get('cursor')
+    page_obj = feed_page(request.user, page_number, cursor)
     context = {
         'page_obj': page_obj,
     }
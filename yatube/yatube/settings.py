@@ -29,6 +29,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -36,10 +37,11 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.RequestMetricsMiddleware',
+    'core.querybudget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -47,14 +49,19 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# Панель отладки только для разработки: в продакшене она не работает
+# и лишь замедляет старт.
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 TEAMPLATES_DIR = os.path.join(BASE_DIR, 'teamplates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.instrumentation.DjangoTemplates',
         'DIRS': [TEAMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -78,6 +85,7 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'ATOMIC_REQUESTS': True,
     }
 }
 
@@ -125,11 +133,103 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 POST_QUANTITY: int = 10
+COMMENT_QUANTITY: int = 20
+API_MAX_LIMIT: int = 1000
+API_CACHE_MAX_AGE: int = 60
+EXPORT_CHUNK_SIZE: int = 2000
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_RATIO: float = 339 / 960
+# Последний формат — запасной для <img>, остальные идут в <source>.
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_IMAGE_SIZES: str = '(min-width: 768px) 67vw, 100vw'
+POST_THUMBNAIL_WORKERS: int = 2
+# Через сколько секунд снова пробовать картинку, генерация которой упала.
+POST_THUMBNAIL_RETRY_AFTER: int = 60 * 10
+TIMELINE_MAX_LENGTH: int = 1000
+TIMELINE_PULL_THRESHOLD: int = 10000
+PAGINATOR_WINDOW: int = 3
+PAGINATOR_COUNT_TTL: int = 300
+POST_CARD_TTL: int = 60 * 60 * 24
+ANONYMOUS_PAGE_CACHE_TTL: int = 60 * 60
+# Бюджет запросов к базе на страницу: (запросов, повторов одного запроса
+# с другими значениями). Замерен для вошедшего пользователя на холодном
+# кеше и не зависит от объёма данных; проверяется тестами и в DEBUG.
+QUERY_BUDGETS = {
+    'posts:index': (5, 0),
+    'posts:group_list': (7, 0),
+    'posts:profile': (8, 0),
+    'posts:post_detail': (7, 0),
+    'posts:post_create': (5, 0),
+    'posts:post_comments': (6, 0),
+    'posts:post_edit': (6, 0),
+    'posts:add_comment': (7, 0),
+    'posts:search': (7, 0),
+    'posts:follow_index': (7, 0),
+    'posts:profile_follow': (14, 0),
+    'posts:profile_unfollow': (10, 0),
+    'api:index': (5, 0),
+    'api:post_detail': (7, 0),
+    'api:group_list': (7, 0),
+    'api:profile': (7, 0),
+    'api:follow_index': (8, 0),
+    'api:export': (4, 0),
+    'users:signup': (2, 0),
+    'users:logout': (2, 0),
+    'users:login': (2, 0),
+    'users:password_change': (4, 0),
+    'users:password_change_done': (4, 0),
+    'users:password_reset': (2, 0),
+    'users:password_reset_done': (2, 0),
+    'users:password_reset_confirm': (3, 0),
+    'users:password_reset_complete': (2, 0),
+    'about:author': (2, 0),
+    'about:tech': (2, 0),
+    'metrics': (2, 0),
+}
+QUERY_BUDGET_STRICT: bool = False
+CACHE_PRESETS = {
+    'locmem': {
+        'BACKEND': 'core.caches.LocMemCache',
+    },
+    'sqlite': {
+        'BACKEND': 'core.caches.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'redis': {
+        'BACKEND': 'core.redis_cache.RedisCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'CONNECTION_POOL_KWARGS': {'max_connections': 50},
+        },
+    },
+}
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE_BACKEND', 'locmem')
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': CACHE_PRESETS[CACHE_BACKEND],
+}
+# Строки замеров запросов (core.instrumentation) пишутся в stderr на
+# уровне INFO; по умолчанию виден только заголовок Server-Timing.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.instrumentation': {
+            'handlers': ['console'],
+            'level': os.environ.get('YATUBE_REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
 }
+# Каталог для метрик воркеров gunicorn (core.metrics): каждый процесс
+# пишет свой файл, /metrics отдаёт сумму. Очищать при перезапуске.
+# Без него метрики ведёт только текущий процесс.
+METRICS_DIR = os.environ.get('YATUBE_METRICS_DIR') or None
 
 ALLOWED_HOSTS = [
     '130.193.43.205'